@@ -0,0 +1,119 @@
+"""
+Adaptive micro-batching for single-record predictions
+Concurrent /predict calls are collected for a short window and scored as one batch
+"""
+
+import threading
+import queue
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+import profiling
+
+
+class MicroBatcher:
+    """Collects single rows from concurrent callers and scores them together.
+
+    A background thread waits for the first queued row, then keeps collecting
+    until `max_batch_size` rows are queued or `max_wait_ms` has passed, and
+    hands the batch to `score_fn` (model, N x 10 matrix -> predictions,
+    confidence, votes). Each row is scored with the model its caller passed
+    to submit(), so rows queued for different model versions during a swap
+    are scored in separate groups. Each caller gets back its own row of the
+    result, or TimeoutError after `timeout_ms`.
+    """
+
+    def __init__(self, score_fn, max_wait_ms: float = 2.0, max_batch_size: int = 64, timeout_ms: float = 1000.0):
+        self.score_fn = score_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.timeout = timeout_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = {}
+        self._batches = 0
+        self._rows = 0
+        self._timeouts = 0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, features, model):
+        """Queue one feature row for `model` and block until its (prediction, confidence, votes) is ready"""
+        if self._closed:
+            raise RuntimeError("Micro-batcher is closed")
+        future = Future()
+        self._queue.put((np.asarray(features, dtype=float), model, future, profiling.current()))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise TimeoutError(f"Micro-batch not scored within {self.timeout * 1000:g} ms")
+
+    def close(self):
+        """Stop the worker thread once queued rows have been scored"""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        """Realized batch sizes so max_wait_ms / max_batch_size can be tuned"""
+        with self._lock:
+            return {
+                'max_wait_ms': self.max_wait * 1000,
+                'max_batch_size': self.max_batch_size,
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'batch_size_counts': dict(sorted(self._batch_sizes.items())),
+                'timeouts': self._timeouts,
+            }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                self._score(group)
+
+            with self._lock:
+                self._batches += 1
+                self._rows += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def _score(self, group):
+        """Score rows queued for one model and hand each caller its row"""
+        futures = [future for _, _, future, _ in group]
+        try:
+            X = np.vstack([features for features, _, _, _ in group])
+            # Profiled callers each get the batch's per-model stages
+            with profiling.shared_stages([profile for _, _, _, profile in group if profile is not None]):
+                predictions, confidence, votes = self.score_fn(group[0][1], X)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for i, future in enumerate(futures):
+            future.set_result((predictions[i], confidence[i], None if votes is None else votes[i]))
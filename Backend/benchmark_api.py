@@ -0,0 +1,226 @@
+"""
+Reproducible performance benchmark for the API and the ensemble
+Drives the FastAPI app in-process (no network) on a scratch database and
+reports throughput and p50/p95/p99 latency per case. Results are saved as
+JSON and can be compared against a stored baseline, so a change to main.py
+or database.py can be checked for slowdowns.
+Run from the Backend folder:
+    python benchmark_api.py                          # run, save benchmark_results.json, compare with the baseline
+    python benchmark_api.py --save-baseline          # record benchmark_baseline.json
+    python benchmark_api.py --threshold 20 --quick   # looser threshold, fewer iterations
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+import numpy as np
+warnings.filterwarnings('ignore')
+
+BATCH_SIZES = [1, 10, 100, 1000]
+HISTORY_SIZES = [10, 100, 1000]
+MODEL_BATCH_SIZES = [1, 1000]
+DEFAULT_ITERATIONS = 300
+DEFAULT_THRESHOLD = 10.0
+DEFAULT_OUTPUT = 'benchmark_results.json'
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+# Value ranges of the ILPD dataset, for synthetic but realistic lab panels
+FEATURE_RANGES = {
+    'Age': (4, 90),
+    'Gender': (0, 1),
+    'Total_Bilirubin': (0.4, 75),
+    'Direct_Bilirubin': (0.1, 19.7),
+    'Alkaline_Phosphotase': (63, 2110),
+    'Alamine_Aminotransferase': (10, 2000),
+    'Aspartate_Aminotransferase': (10, 4929),
+    'Total_Proteins': (2.7, 9.6),
+    'Albumin': (0.9, 5.5),
+    'Albumin_and_Globulin_Ratio': (0.3, 2.8),
+}
+
+
+def make_records(n, seed=0):
+    """n distinct request bodies, so the prediction cache does not serve them"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(n):
+        record = {name: round(float(rng.uniform(low, high)), 2) for name, (low, high) in FEATURE_RANGES.items()}
+        record['Gender'] = float(rng.integers(2))
+        records.append(record)
+    return records
+
+
+def measure(fn, iterations, warmup=10):
+    """Call fn(i) `iterations` times; return throughput (calls/s) and latency percentiles in ms"""
+    for i in range(warmup):
+        fn(i)
+    timings = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - call_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        'iterations': iterations,
+        'throughput_per_s': iterations / elapsed,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'p99_ms': float(np.percentile(timings, 99)),
+    }
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path} "
+                           f"returned {response.status_code}: {response.text}")
+    return response
+
+
+def run_benchmarks(iterations, selected=None):
+    """Run every case (or those whose name starts with one of `selected`) and return the results"""
+    import database
+    directory = tempfile.mkdtemp(prefix='liver-benchmark-')
+    # main runs init_db at import, so point it at the scratch database first
+    database.DB_PATH = os.path.join(directory, 'benchmark.db')
+    from fastapi.testclient import TestClient
+    import main
+    client = TestClient(main.app)
+
+    def wanted(name):
+        return selected is None or any(name.startswith(prefix) for prefix in selected)
+
+    records = make_records(iterations + 10)
+    cases = {}
+
+    def run(name, fn, n=iterations):
+        if wanted(name):
+            cases[name] = measure(fn, n)
+            result = cases[name]
+            print(f"{name:<26} {result['throughput_per_s']:>12,.1f} {result['p50_ms']:>10.3f} "
+                  f"{result['p95_ms']:>10.3f} {result['p99_ms']:>10.3f}")
+
+    print(f"{'Case':<26} {'calls/s':>12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+
+    run('predict', lambda i: check(client.post('/predict', json=records[i % len(records)])))
+
+    check(client.post('/signup', json={'username': 'bench', 'password': 'bench',
+                                       'email': 'bench@example.com', 'full_name': 'Benchmark User'}))
+    run('predict_user', lambda i: check(client.post('/predict/bench', json=records[i % len(records)])))
+
+    for batch_size in BATCH_SIZES:
+        body = {'records': make_records(batch_size, seed=batch_size)}
+        run(f'batch_predict_{batch_size}', lambda i: check(client.post('/batch-predict', json=body)),
+            n=max(5, iterations // max(1, batch_size // 10)))
+
+    for history_size in HISTORY_SIZES:
+        username = f'history{history_size}'
+        if not wanted(f'history_{history_size}'):
+            continue
+        check(client.post('/signup', json={'username': username, 'password': 'bench',
+                                           'email': f'{username}@example.com', 'full_name': username}))
+        user = database.get_user(username)
+        database.add_predictions([
+            dict(user_id=user['id'], age=record['Age'], gender='Male' if record['Gender'] == 1 else 'Female',
+                 tb=record['Total_Bilirubin'], db=record['Direct_Bilirubin'], alkphos=record['Alkaline_Phosphotase'],
+                 sgpt=record['Alamine_Aminotransferase'], sgot=record['Aspartate_Aminotransferase'],
+                 tp=record['Total_Proteins'], alb=record['Albumin'], ag_ratio=record['Albumin_and_Globulin_Ratio'],
+                 prediction=1, status='Liver Disease Detected', confidence=100.0)
+            for record in make_records(history_size, seed=history_size)
+        ])
+        run(f'history_{history_size}', lambda i: check(client.get(f'/history/{username}')),
+            n=max(5, iterations // max(1, history_size // 100)))
+
+    # Raw per-model inference on pre-scaled rows, without HTTP or voting overhead
+    model = main.model_registry.active.model
+    for batch_size in MODEL_BATCH_SIZES:
+        X = model.transform([[record[name] for name in main.FEATURE_NAMES]
+                             for record in make_records(batch_size, seed=batch_size)])
+        for name in ('knn', 'rf', 'svm'):
+            estimator = getattr(model, name)
+            if estimator is not None:
+                run(f'model_{name}_{batch_size}', lambda i: estimator.predict(X),
+                    n=iterations if batch_size == 1 else max(5, iterations // 10))
+
+    main.flush_history()
+    database.close_connections()
+    shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'model_version': main.model_registry.active.version,
+        },
+        'iterations': iterations,
+        'cases': cases,
+    }
+
+
+def compare_with_baseline(results, baseline, threshold):
+    """Print the change per case and return the names of cases slower than `threshold` percent.
+
+    A case regresses when its p50 latency grew, or its throughput fell, by
+    more than the threshold. Cases missing from either file are skipped.
+    """
+    print("\n" + "="*80)
+    print(f"Compared with baseline from {baseline.get('created_at', '?')} (threshold {threshold:.0f}%)")
+    print("="*80)
+    print(f"{'Case':<26} {'p50 base':>10} {'p50 now':>10} {'change':>9} {'calls/s change':>15}")
+    regressions = []
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if previous is None:
+            continue
+        latency_change = (current['p50_ms'] / previous['p50_ms'] - 1) * 100
+        throughput_change = (current['throughput_per_s'] / previous['throughput_per_s'] - 1) * 100
+        regressed = latency_change > threshold or throughput_change < -threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<26} {previous['p50_ms']:>10.3f} {current['p50_ms']:>10.3f} {latency_change:>+8.1f}% "
+              f"{throughput_change:>+14.1f}%{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the prediction API and the ensemble models")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS,
+                        help="Calls per single-record case; larger batches and histories use fewer")
+    parser.add_argument('--quick', action='store_true', help="A tenth of the iterations, for a fast check")
+    parser.add_argument('--cases', nargs='*', help="Only run cases whose name starts with one of these")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Where to save the results as JSON")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Save the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Percent slowdown of p50 latency or throughput that counts as a regression")
+    args = parser.parse_args()
+
+    iterations = max(10, args.iterations // 10) if args.quick else args.iterations
+    results = run_benchmarks(iterations, args.cases)
+
+    with open(args.baseline if args.save_baseline else args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        print(f"\n✅ Baseline saved to {args.baseline}")
+        sys.exit(0)
+    print(f"\n✅ Results saved to {args.output}")
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; record one with --save-baseline")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n⚠️ {len(regressions)} case(s) regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\n✅ No regressions")
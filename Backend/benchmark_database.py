@@ -0,0 +1,118 @@
+"""
+Benchmark the database layer under parallel reads and writes
+Compares the old connect-per-call access (rollback journal) with the pooled
+WAL connections in database.py, on a scratch copy of the schema. User
+lookups skip the user cache, so both sides query SQLite for every call.
+Run from the Backend folder: python benchmark_database.py
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import database
+
+THREAD_COUNTS = [1, 4, 16]
+OPS_PER_THREAD = 300
+WRITE_FRACTION = 0.2
+USERS = 50
+PREDICTION_VALUES = (45.0, 'Male', 1.2, 0.3, 200.0, 30.0, 40.0, 6.5, 3.2, 0.9, 1, 'Liver Disease Detected', 66.7)
+
+
+def legacy_get_user(username):
+    """Old access pattern: a fresh connection per call in the default journal mode"""
+    conn = sqlite3.connect(database.DB_PATH)
+    row = conn.execute('SELECT id, username, password, email, full_name, created_at FROM users WHERE username = ?',
+                       (username,)).fetchone()
+    conn.close()
+    return row
+
+
+def legacy_get_user_predictions(user_id):
+    conn = sqlite3.connect(database.DB_PATH)
+    rows = conn.execute('SELECT * FROM predictions WHERE user_id = ? ORDER BY created_at DESC', (user_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_add_prediction(user_id, *values):
+    try:
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute('''INSERT INTO predictions
+                        (user_id, age, gender, tb, db, alkphos, sgpt, sgot, tp, alb, ag_ratio, prediction, status, confidence)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', (user_id, *values))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def pooled_get_user(username):
+    """database.get_user without the user cache: the pooled connection query only"""
+    return database._run(lambda c: database._select_user(c, username))
+
+
+ACCESS = {
+    'connect-per-call': (legacy_get_user, legacy_get_user_predictions, legacy_add_prediction),
+    'pooled WAL': (pooled_get_user, database.get_user_predictions, database.add_prediction),
+}
+
+
+def fresh_database(directory, name):
+    """Point database.DB_PATH at a new scratch database seeded with users and some history"""
+    database.close_connections()
+    database.DB_PATH = os.path.join(directory, f'{name}.db')
+    database.init_db()
+    for i in range(USERS):
+        database.add_user(f'user{i}', 'password', f'user{i}@example.com', f'User {i}')
+        for _ in range(20):
+            database.add_prediction(i + 1, *PREDICTION_VALUES)
+    database.close_connections()
+    if name == 'connect-per-call':
+        # Start the old path from the default rollback journal
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+
+
+def worker(access, seed, errors):
+    """Mixed workload: mostly /predict/{username}-style reads, some history inserts"""
+    get_user, get_user_predictions, add_prediction = access
+    rng = np.random.default_rng(seed)
+    timings = []
+    for _ in range(OPS_PER_THREAD):
+        user = int(rng.integers(USERS))
+        start = time.perf_counter()
+        if rng.random() < WRITE_FRACTION:
+            get_user(f'user{user}')
+            if not add_prediction(user + 1, *PREDICTION_VALUES):
+                errors.append(1)
+        else:
+            get_user(f'user{user}')
+            get_user_predictions(user + 1)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(name, access, n_threads):
+    errors = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as pool:
+        results = list(pool.map(lambda seed: worker(access, seed, errors), range(n_threads)))
+    elapsed = time.perf_counter() - start
+    timings = np.concatenate(results)
+    print(f"{name:>18} {n_threads:>8} {len(timings) / elapsed:>10,.0f} {np.percentile(timings, 50):>10.3f} "
+          f"{np.percentile(timings, 99):>10.3f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    print(f"{'Access':>18} {'Threads':>8} {'ops/s':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'failed':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_threads in THREAD_COUNTS:
+            for name, access in ACCESS.items():
+                fresh_database(directory, name)
+                run(name, access, n_threads)
+        database.close_connections()
@@ -0,0 +1,100 @@
+"""
+Benchmark the NumPy inference engines against the sklearn estimators
+Run from the Backend folder after training: python benchmark_engines.py
+"""
+
+import pickle
+import time
+import warnings
+import numpy as np
+from engines import KNNEngine, RandomForestEngine, SVMEngine
+warnings.filterwarnings('ignore')
+
+BATCH_SIZES = [1, 100, 10_000, 1_000_000]
+
+
+def load_models():
+    """Load the pipelines and the shared scaler from voting_ensemble_model.pkl"""
+    with open('voting_ensemble_model.pkl', 'rb') as f:
+        model_data = pickle.load(f)
+    return model_data['knn_pipeline'], model_data['rf_pipeline'], model_data['svm_pipeline']
+
+
+def make_queries(knn, n_rows, seed=0):
+    """Scaled query rows: training rows with some noise, like real lab panels"""
+    rng = np.random.default_rng(seed)
+    X_train = knn._fit_X
+    rows = X_train[rng.integers(0, len(X_train), n_rows)]
+    return rows + rng.normal(0, 0.25, rows.shape)
+
+
+def time_call(fn, X, repeats):
+    """Best-of-`repeats` wall time in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def latency_percentiles(fn, X, repeats=1000):
+    """p50 and p99 latency in milliseconds over `repeats` calls"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def compare(name, reference_fn, engine_fn, queries_fn):
+    """Print sklearn vs engine timings per batch size and check predictions match"""
+    print("\n" + "="*80)
+    print(f"{name}: sklearn vs engine")
+    print("="*80)
+
+    X = queries_fn(1)
+    reference_p50, reference_p99 = latency_percentiles(reference_fn, X, repeats=300)
+    engine_p50, engine_p99 = latency_percentiles(engine_fn, X)
+    print(f"Batch size 1 latency  sklearn p50 {reference_p50:.3f} ms, p99 {reference_p99:.3f} ms | "
+          f"engine p50 {engine_p50:.3f} ms, p99 {engine_p99:.3f} ms")
+    print(f"{'Batch':>10} {'sklearn (ms)':>14} {'engine (ms)':>14} {'speedup':>9} {'engine rows/s':>15} {'match':>7}")
+
+    for batch_size in BATCH_SIZES:
+        X = queries_fn(batch_size)
+        repeats = 200 if batch_size == 1 else 20 if batch_size <= 100 else 3 if batch_size <= 10_000 else 1
+        reference_ms = time_call(reference_fn, X, repeats)
+        engine_ms = time_call(engine_fn, X, repeats)
+        match = np.array_equal(reference_fn(X), engine_fn(X))
+        print(f"{batch_size:>10} {reference_ms:>14.3f} {engine_ms:>14.3f} {reference_ms / engine_ms:>8.1f}x "
+              f"{batch_size / engine_ms * 1000:>15,.0f} {str(match):>7}")
+
+
+def benchmark_knn(knn_pipeline):
+    knn = knn_pipeline.steps[-1][1]
+    engine = KNNEngine.from_estimator(knn)
+    compare(f"KNN (k={knn.n_neighbors})", knn.predict, engine.predict, lambda n: make_queries(knn, n))
+
+
+def benchmark_rf(rf_pipeline, knn_pipeline):
+    rf = rf_pipeline.steps[-1][1]
+    # Single job for sklearn too, so both sides use one core per call
+    rf.set_params(n_jobs=1)
+    engine = RandomForestEngine.from_estimator(rf, n_threads=1)
+    knn = knn_pipeline.steps[-1][1]
+    compare(f"Random Forest ({len(rf.estimators_)} trees)", rf.predict, engine.predict, lambda n: make_queries(knn, n))
+
+
+def benchmark_svm(svm_pipeline, knn_pipeline):
+    svm = svm_pipeline.steps[-1][1]
+    engine = SVMEngine.from_estimator(svm)
+    knn = knn_pipeline.steps[-1][1]
+    compare(f"SVM ({svm.kernel}, C={svm.C})", svm.predict, engine.predict, lambda n: make_queries(knn, n))
+
+
+if __name__ == "__main__":
+    knn_pipeline, rf_pipeline, svm_pipeline = load_models()
+    benchmark_knn(knn_pipeline)
+    benchmark_rf(rf_pipeline, knn_pipeline)
+    benchmark_svm(svm_pipeline, knn_pipeline)
@@ -0,0 +1,108 @@
+"""
+Benchmark response serialization for /batch-predict and /history
+Compares, per record, the response_model path (the handler's dicts are
+validated against the response model, converted back and encoded with
+json.dumps, and history rows pre-encode medical_parameters with json.dumps)
+with the FastJSONResponse path in main.py. Scoring and database reads are
+not timed: the bodies are built from synthetic results and rows.
+Run from the Backend folder: python benchmark_serialization.py
+"""
+
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from pydantic import TypeAdapter
+from fastapi.responses import JSONResponse
+import database
+import fast_json
+
+RECORD_COUNTS = [10, 100, 1000, 10000]
+REPEATS = 20
+
+
+def make_batch(n, rng):
+    return {
+        'total_records': n,
+        'results': [
+            {'index': i, 'prediction': int(prediction), 'status': 'Liver Disease Detected' if prediction else 'No Liver Disease',
+             'confidence': float(confidence)}
+            for i, (prediction, confidence) in enumerate(zip(rng.integers(0, 2, n), rng.choice([100.0, 200 / 3, 100 / 3], n)))
+        ]
+    }
+
+
+def make_rows(n, rng):
+    """Rows as get_user_predictions reads them from SQLite"""
+    return [
+        (i, 1, float(rng.uniform(4, 90)), 'Male' if rng.integers(2) else 'Female',
+         *(round(float(value), 2) for value in rng.uniform(0.1, 100, 8)),
+         int(rng.integers(2)), 'Liver Disease Detected', 200 / 3, '2026-01-05 09:12:44')
+        for i in range(n, 0, -1)
+    ]
+
+
+def legacy_records(rows):
+    """The records before: medical_parameters encoded with json.dumps, then copied into new dicts"""
+    predictions = []
+    for row in rows:
+        medical_params = dict(zip(database.MEDICAL_PARAMETERS_ORDER, (row[2], 1 if row[3] == 'Male' else 0, *row[4:12])))
+        predictions.append({'id': row[0], 'medical_parameters': json.dumps(medical_params), 'prediction': row[12],
+                            'status': row[13], 'confidence': row[14], 'timestamp': row[15]})
+    return [{'id': p['id'], 'medical_parameters': p['medical_parameters'], 'prediction': p['prediction'],
+             'status': p['status'], 'confidence': p['confidence'], 'timestamp': p['timestamp']} for p in predictions]
+
+
+def fast_records(rows):
+    return [{'id': row[0], 'medical_parameters': database._medical_parameters_json(row), 'prediction': row[12],
+             'status': row[13], 'confidence': row[14], 'timestamp': row[15]} for row in rows]
+
+
+def response_model_body(adapter, content):
+    """What FastAPI does with a returned dict when the route has a response_model"""
+    value = adapter.validate_python(content)
+    return JSONResponse(adapter.dump_python(value, mode='json')).body
+
+
+def best_of(fn, repeats=REPEATS):
+    """Fastest of `repeats` calls, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(case, n, before, after):
+    if before() != after():
+        raise AssertionError(f"{case}: the two paths produce different bodies")
+    before_us = best_of(before) / n * 1e6
+    after_us = best_of(after) / n * 1e6
+    print(f"{case:<14} {n:>8} {before_us:>16.2f} {after_us:>12.2f} {before_us / after_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    # main runs init_db at import; keep it off liver_disease.db
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix='liver-serialization-'), 'benchmark.db')
+    from main import BatchPredictionResponse, HistoryResponse
+    rng = np.random.default_rng(0)
+    batch_adapter = TypeAdapter(BatchPredictionResponse)
+    history_adapter = TypeAdapter(HistoryResponse)
+    encoder = 'orjson' if fast_json.orjson is not None else 'json (pip install orjson for the faster encoder)'
+    print(f"FastJSONResponse encoder: {encoder}")
+    print(f"{'Case':<14} {'Records':>8} {'response_model':>16} {'fast path':>12} {'speedup':>10}")
+    print(f"{'':<14} {'':>8} {'(us/record)':>16} {'(us/record)':>12}")
+    for n in RECORD_COUNTS:
+        content = make_batch(n, rng)
+        run('batch-predict', n, lambda: response_model_body(batch_adapter, content),
+            lambda: fast_json.dumps(content))
+    for n in RECORD_COUNTS:
+        rows = make_rows(n, rng)
+
+        def history(records):
+            return {'username': 'benchmark', 'records': records, 'total_predictions': n, 'next_before_id': None}
+
+        run('history', n, lambda: response_model_body(history_adapter, history(legacy_records(rows))),
+            lambda: fast_json.dumps(history(fast_records(rows))))
@@ -0,0 +1,125 @@
+"""
+Incremental parsing of ILPD-layout CSV uploads for /batch-predict/csv
+The request body is read chunk by chunk, so memory stays bounded by one
+chunk of rows no matter how large the file is
+"""
+
+import csv
+import os
+import numpy as np
+from starlette.responses import StreamingResponse
+
+# Rows parsed and scored together; each chunk is streamed back before the next is read
+CSV_STREAM_CHUNK_ROWS = int(os.environ.get('CSV_STREAM_CHUNK_ROWS', 1000))
+
+# A line longer than this is rejected instead of buffered without bound
+CSV_MAX_LINE_BYTES = 64 * 1024
+
+# Same column layout as 'Indian Liver Patient Dataset (ILPD).csv': the ten
+# features in FEATURE_NAMES order, optionally followed by is_patient (ignored)
+N_FEATURES = 10
+GENDER_COLUMN = 1
+GENDERS = {'M': 1.0, 'MALE': 1.0, 'F': 0.0, 'FEMALE': 0.0, '1': 1.0, '0': 0.0}
+
+
+class CSVLineTooLong(ValueError):
+    pass
+
+
+async def iter_row_chunks(byte_stream, chunk_rows: int = CSV_STREAM_CHUNK_ROWS):
+    """Yield lists of (index, fields) from an async stream of CSV bytes.
+
+    index counts data rows from 0; a header row (first field not a number)
+    and blank lines are skipped.
+    """
+    buffer = b''
+    index = 0
+    first_line = True
+    rows = []
+
+    def take_lines(lines):
+        nonlocal index, first_line
+        for fields in csv.reader(lines):
+            if not fields or not ''.join(fields).strip():
+                continue
+            if first_line:
+                first_line = False
+                fields[0] = fields[0].lstrip('\ufeff')
+                if not _is_number(fields[0]):
+                    continue
+            rows.append((index, fields))
+            index += 1
+
+    async for data in byte_stream:
+        buffer += data
+        if b'\n' in data:
+            *complete, buffer = buffer.split(b'\n')
+            take_lines(line.decode('utf-8').rstrip('\r') for line in complete)
+        if len(buffer) > CSV_MAX_LINE_BYTES:
+            raise CSVLineTooLong(f"CSV line is longer than {CSV_MAX_LINE_BYTES} bytes")
+        while len(rows) >= chunk_rows:
+            yield rows[:chunk_rows]
+            del rows[:chunk_rows]
+
+    if buffer.strip():
+        take_lines([buffer.decode('utf-8').rstrip('\r')])
+    while rows:
+        yield rows[:chunk_rows]
+        del rows[:chunk_rows]
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse that may keep reading the request body while it sends.
+
+    Starlette's StreamingResponse listens for a client disconnect while
+    streaming, which competes with the endpoint for the request body. Here the
+    body stream reports a disconnect itself (ClientDisconnect).
+    """
+
+    media_type = 'application/x-ndjson'
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def parse_rows(rows):
+    """Convert (index, fields) rows to a feature matrix.
+
+    Returns (X, indices, errors): the N x 10 matrix of valid rows, their data
+    row indices, and (index, message) for rows that could not be parsed.
+    """
+    X = np.empty((len(rows), N_FEATURES))
+    indices = []
+    errors = []
+    for index, fields in rows:
+        try:
+            X[len(indices)] = _parse_fields(fields)
+        except ValueError as e:
+            errors.append((index, str(e)))
+            continue
+        indices.append(index)
+    return X[:len(indices)], indices, errors
+
+
+def _parse_fields(fields):
+    if len(fields) < N_FEATURES:
+        raise ValueError(f"Expected {N_FEATURES} feature columns, got {len(fields)}")
+    values = [field.strip() for field in fields[:N_FEATURES]]
+    gender = GENDERS.get(values[GENDER_COLUMN].upper())
+    if gender is None:
+        raise ValueError(f"Invalid Gender value: {values[GENDER_COLUMN]!r}")
+    values[GENDER_COLUMN] = gender
+    row = np.array([float(value) if value != '' else np.nan for value in values])
+    if not np.isfinite(row).all():
+        raise ValueError("Missing, non-numeric or infinite feature value")
+    return row
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
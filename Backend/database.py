@@ -1,13 +1,119 @@
 import sqlite3
 import os
+import json
+import functools
+import random
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import List, Optional, Dict
+from metrics import DB_LATENCY, DB_ERRORS
+import profiling
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'liver_disease.db')
 
+# Connection settings: every thread keeps one open connection in WAL mode, so
+# readers never block on a writer and a request does not reconnect per query
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', 5.0))
+DB_BUSY_RETRIES = int(os.environ.get('DB_BUSY_RETRIES', 5))
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 8192))
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+def _forget_connections():
+    """In a forked child: drop the parent's connections unused, SQLite handles are not fork-safe"""
+    global _local, _connections_lock, _generation
+    _local = threading.local()
+    _connections.clear()
+    _connections_lock = threading.Lock()
+    _generation += 1
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_connections)
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # NORMAL is durable in WAL mode except for the last commits on power loss
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+def get_connection() -> sqlite3.Connection:
+    """This thread's connection to DB_PATH, opened on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH or _local.generation != _generation:
+        conn = _connect()
+        _local.conn, _local.path, _local.generation = conn, DB_PATH, _generation
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+def close_connections():
+    """Close every pooled connection (threads reconnect on their next query)"""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+def _run(work, commit=False):
+    """Run work(cursor) on this thread's connection, backing off and retrying while the database is busy"""
+    conn = get_connection()
+    for attempt in range(DB_BUSY_RETRIES + 1):
+        try:
+            result = work(conn.cursor())
+            if commit:
+                conn.commit()
+            return result
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if not _is_busy(e) or attempt == DB_BUSY_RETRIES:
+                raise
+            time.sleep(min(0.01 * 2 ** attempt, 0.5) * random.uniform(0.5, 1.0))
+        except Exception:
+            conn.rollback()
+            raise
+
+def _instrumented(fn):
+    """Time fn into db_call_duration_seconds and the request profile; count exceptions and False results as errors"""
+    latency = DB_LATENCY.labels(fn.__name__)
+    errors = DB_ERRORS.labels(fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            latency.observe(elapsed)
+            profiling.record(f'db_{fn.__name__}', elapsed)
+        if result is False:
+            errors.inc()
+        return result
+    return wrapper
+
+@_instrumented
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
     
     # Users table
@@ -42,100 +148,320 @@ def init_db():
     )''')
     
     conn.commit()
-    conn.close()
+    migrate(conn)
+
+# Schema migrations, applied in order to databases whose PRAGMA user_version is older
+MIGRATIONS = [
+    # 1: history lookups by user, newest first, without a table scan or sort
+    'CREATE INDEX IF NOT EXISTS idx_predictions_user_created ON predictions(user_id, created_at, id)',
+    # 2: per-user history totals kept up to date by the write functions, backfilled from existing rows
+    '''CREATE TABLE IF NOT EXISTS prediction_summary (
+        user_id INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL,
+        positive INTEGER NOT NULL,
+        confidence_sum REAL NOT NULL,
+        first_at TIMESTAMP,
+        last_at TIMESTAMP,
+        age_sum REAL NOT NULL,
+        tb_sum REAL NOT NULL,
+        db_sum REAL NOT NULL,
+        alkphos_sum REAL NOT NULL,
+        sgpt_sum REAL NOT NULL,
+        sgot_sum REAL NOT NULL,
+        tp_sum REAL NOT NULL,
+        alb_sum REAL NOT NULL,
+        ag_ratio_sum REAL NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+    DELETE FROM prediction_summary;
+    INSERT INTO prediction_summary
+        SELECT user_id, COUNT(*), SUM(prediction), SUM(confidence), MIN(created_at), MAX(created_at),
+               SUM(age), SUM(tb), SUM(db), SUM(alkphos), SUM(sgpt), SUM(sgot), SUM(tp), SUM(alb), SUM(ag_ratio)
+        FROM predictions GROUP BY user_id''',
+    # 3: exports across all users stream in time order straight from the index, without a sort
+    'CREATE INDEX IF NOT EXISTS idx_predictions_created ON predictions(created_at)',
+    # 4: history pages keyed on the AUTOINCREMENT id, which only grows, so a cursor needs no lookup
+    'CREATE INDEX IF NOT EXISTS idx_predictions_user_id ON predictions(user_id, id)',
+]
+
+def migrate(conn: sqlite3.Connection):
+    """Bring an existing database up to the latest schema version"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, statement in enumerate(MIGRATIONS[version:], start=version + 1):
+        # One transaction per migration, so a backfill and its version number land together
+        conn.executescript(f'BEGIN; {statement}; PRAGMA user_version = {number}; COMMIT;')
+        print(f"✅ Database migrated to schema version {number}")
+
+# In-process user cache: found users live USER_CACHE_TTL seconds, unknown
+# usernames USER_CACHE_NEGATIVE_TTL seconds (kept short so a user created by
+# another worker process can log in almost at once); USER_CACHE_SIZE=0 disables it
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 60.0))
+USER_CACHE_NEGATIVE_TTL = float(os.environ.get('USER_CACHE_NEGATIVE_TTL', 2.0))
+
+class UserCache:
+    """Thread-safe LRU of user rows (or None for unknown usernames) with expiry.
+
+    Concurrent misses for the same username are coalesced: one thread loads
+    the row while the others wait for it, so a burst does not stampede SQLite.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key):
+        """(found, user) from a live entry; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        if user is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, user
+
+    def get_or_load(self, key, load):
+        """Cached user for key, or load() it once for every concurrent caller"""
+        if self.max_entries == 0:
+            return load()
+        while True:
+            with self._lock:
+                found, user = self._lookup(key)
+                if found:
+                    return user
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+                self.coalesced += 1
+            # Another thread is loading this user; use its result when it is done
+            loading.wait()
+        try:
+            user = load()
+            self.put(key, user)
+            return user
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading.set()
+
+    def put(self, key, user):
+        if self.max_entries == 0:
+            return
+        ttl = self.ttl if user is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'negative_ttl_seconds': self.negative_ttl,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL)
+
+USER_COLUMNS = ('id', 'username', 'password', 'email', 'full_name', 'created_at')
+
+def _select_user(c, username):
+    row = c.execute('SELECT id, username, password, email, full_name, created_at FROM users WHERE username = ?', 
+                    (username,)).fetchone()
+    return dict(zip(USER_COLUMNS, row)) if row else None
 
 # User functions
+@_instrumented
 def add_user(username: str, password: str, email: str, full_name: str) -> bool:
     """Add a new user to the database"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+    def insert(c):
         c.execute('''INSERT INTO users (username, password, email, full_name)
                      VALUES (?, ?, ?, ?)''', 
                   (username, password, email, full_name))
-        conn.commit()
-        conn.close()
-        return True
+        return _select_user(c, username)
+
+    try:
+        user = _run(insert, commit=True)
     except sqlite3.IntegrityError:
+        # The cached entry may be a stale "unknown user"; look it up again next time
+        user_cache.invalidate((DB_PATH, username))
         return False
+    user_cache.put((DB_PATH, username), user)
+    return True
 
+@_instrumented
 def get_user(username: str) -> Optional[Dict]:
     """Get user by username"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT id, username, password, email, full_name, created_at FROM users WHERE username = ?', 
-              (username,))
-    row = c.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            'id': row[0],
-            'username': row[1],
-            'password': row[2],
-            'email': row[3],
-            'full_name': row[4],
-            'created_at': row[5]
-        }
-    return None
+    user = user_cache.get_or_load((DB_PATH, username), lambda: _run(lambda c: _select_user(c, username)))
+    return dict(user) if user else None
 
 def user_exists(username: str) -> bool:
     """Check if user exists"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('SELECT 1 FROM users WHERE username = ?', (username,))
-    exists = c.fetchone() is not None
-    conn.close()
-    return exists
+    return get_user(username) is not None
+
+# Per-user history summary: counts and sums over the user's predictions, so
+# totals and means are read from one row however long the history is
+SUMMARY_VALUES = ('age', 'tb', 'db', 'alkphos', 'sgpt', 'sgot', 'tp', 'alb', 'ag_ratio')
+SUMMARY_SUMS = ('total', 'positive', 'confidence_sum') + tuple(f'{column}_sum' for column in SUMMARY_VALUES)
+# TOTAL() rather than SUM(): 0.0 instead of NULL when no row matches
+SUMMARY_AGGREGATES = ('COUNT(*)', 'TOTAL(prediction)', 'TOTAL(confidence)') + tuple(
+    f'TOTAL({column})' for column in SUMMARY_VALUES)
+
+def _summarize_inserted(c, count):
+    """Add the `count` rows just inserted in this transaction to their users' summaries.
+
+    The write lock is held from the first insert on, so those rows have the
+    `count` highest ids.
+    """
+    last_id = c.execute('SELECT MAX(id) FROM predictions').fetchone()[0]
+    c.execute(f'''INSERT INTO prediction_summary (user_id, {', '.join(SUMMARY_SUMS)}, first_at, last_at)
+                  SELECT user_id, {', '.join(SUMMARY_AGGREGATES)}, MIN(created_at), MAX(created_at)
+                  FROM predictions WHERE id > ? GROUP BY user_id
+                  ON CONFLICT(user_id) DO UPDATE SET
+                  {', '.join(f'{column} = {column} + excluded.{column}' for column in SUMMARY_SUMS)},
+                  first_at = MIN(first_at, excluded.first_at), last_at = MAX(last_at, excluded.last_at)''',
+              (last_id - count,))
+
+def _summarize_deleted(c, user_id, where='', params=()):
+    """Subtract the user's predictions (those matching `where`) from the summary; call before deleting them"""
+    subtracted = ', '.join(f'{column} - {aggregate}' for column, aggregate in zip(SUMMARY_SUMS, SUMMARY_AGGREGATES))
+    c.execute(f'''UPDATE prediction_summary SET ({', '.join(SUMMARY_SUMS)}) =
+                  (SELECT {subtracted} FROM predictions WHERE user_id = ? {where})
+                  WHERE user_id = ?''', (user_id, *params, user_id))
+
+def _refresh_summary_bounds(c, user_id):
+    """After a delete: drop an emptied summary, else look the first/last timestamps up on the index"""
+    c.execute('DELETE FROM prediction_summary WHERE user_id = ? AND total <= 0', (user_id,))
+    c.execute('''UPDATE prediction_summary SET
+                 first_at = (SELECT MIN(created_at) FROM predictions WHERE user_id = ?),
+                 last_at = (SELECT MAX(created_at) FROM predictions WHERE user_id = ?)
+                 WHERE user_id = ?''', (user_id, user_id, user_id))
 
 # Prediction history functions
+@_instrumented
 def add_prediction(user_id: int, age: float, gender: str, tb: float, db: float,
                    alkphos: float, sgpt: float, sgot: float, tp: float, alb: float,
                    ag_ratio: float, prediction: int, status: str, confidence: float) -> bool:
     """Add a prediction to history"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+    def insert(c):
         c.execute('''INSERT INTO predictions 
                      (user_id, age, gender, tb, db, alkphos, sgpt, sgot, tp, alb, ag_ratio, prediction, status, confidence)
                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                   (user_id, age, gender, tb, db, alkphos, sgpt, sgot, tp, alb, ag_ratio, prediction, status, confidence))
-        conn.commit()
-        conn.close()
+        _summarize_inserted(c, 1)
+
+    try:
+        _run(insert, commit=True)
         return True
     except Exception as e:
         print(f"Error adding prediction: {e}")
         return False
 
-def get_user_predictions(user_id: int) -> List[Dict]:
-    """Get all predictions for a user"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute('''SELECT id, user_id, age, gender, tb, db, tp, alb, ag_ratio, sgpt, sgot, alkphos, 
-                 prediction, status, confidence, created_at 
-                 FROM predictions WHERE user_id = ? ORDER BY created_at DESC''',
-              (user_id,))
-    rows = c.fetchall()
-    conn.close()
+PREDICTION_COLUMNS = ('user_id', 'age', 'gender', 'tb', 'db', 'alkphos', 'sgpt', 'sgot', 'tp', 'alb',
+                      'ag_ratio', 'prediction', 'status', 'confidence')
+
+@_instrumented
+def add_predictions(records: List[Dict]) -> bool:
+    """Add many predictions (dicts with the add_prediction arguments) in one transaction"""
+    try:
+        rows = [tuple(record[column] for column in PREDICTION_COLUMNS) for record in records]
+        if not rows:
+            return True
+
+        def insert(c):
+            c.executemany(f'''INSERT INTO predictions ({', '.join(PREDICTION_COLUMNS)})
+                             VALUES ({', '.join('?' * len(PREDICTION_COLUMNS))})''', rows)
+            _summarize_inserted(c, len(rows))
+
+        _run(insert, commit=True)
+        return True
+    except Exception as e:
+        print(f"Error adding predictions: {e}")
+        return False
+
+# Keys of the medical_parameters JSON, in the order of the columns age..alkphos selected below
+MEDICAL_PARAMETERS_ORDER = ('Age', 'Gender', 'Total_Bilirubin', 'Direct_Bilirubin', 'Total_Proteins', 'Albumin',
+                            'Albumin_and_Globulin_Ratio', 'Alamine_Aminotransferase', 'Aspartate_Aminotransferase',
+                            'Alkaline_Phosphotase')
+# The same text json.dumps writes for that dict, formatted directly: REAL
+# columns come back as floats, and json.dumps writes numbers with repr()
+MEDICAL_PARAMETERS_JSON = '{' + ', '.join(f'"{name}": %r' for name in MEDICAL_PARAMETERS_ORDER) + '}'
+
+def _medical_parameters_json(row):
+    values = (row[2], 1 if row[3] == 'Male' else 0, *row[4:12])
+    text = MEDICAL_PARAMETERS_JSON % values
+    if 'inf' in text or 'nan' in text:
+        # json.dumps spells these Infinity and NaN
+        return json.dumps(dict(zip(MEDICAL_PARAMETERS_ORDER, values)))
+    return text
+
+@_instrumented
+def get_user_predictions(user_id: int, limit: Optional[int] = None, before_id: Optional[int] = None) -> List[Dict]:
+    """Get a user's predictions, newest first.
+
+    limit caps the page size; before_id is a keyset cursor that returns only
+    records older than that prediction. Ids are AUTOINCREMENT, so newest first
+    is id order and the cursor still works after its prediction is deleted.
+    """
+    def query(c):
+        sql = '''SELECT id, user_id, age, gender, tb, db, tp, alb, ag_ratio, sgpt, sgot, alkphos, 
+                  prediction, status, confidence, created_at 
+                  FROM predictions WHERE user_id = ?'''
+        params = [user_id]
+        if before_id is not None:
+            sql += ' AND id < ?'
+            params.append(before_id)
+        sql += ' ORDER BY id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return c.execute(sql, params).fetchall()
+
+    rows = _run(query)
     
-    import json
     predictions = []
     for row in rows:
-        medical_params = {
-            'Age': row[2],
-            'Gender': 1 if row[3] == 'Male' else 0,
-            'Total_Bilirubin': row[4],
-            'Direct_Bilirubin': row[5],
-            'Total_Proteins': row[6],
-            'Albumin': row[7],
-            'Albumin_and_Globulin_Ratio': row[8],
-            'Alamine_Aminotransferase': row[9],
-            'Aspartate_Aminotransferase': row[10],
-            'Alkaline_Phosphotase': row[11]
-        }
         predictions.append({
             'id': row[0],
-            'medical_parameters': json.dumps(medical_params),
+            'medical_parameters': _medical_parameters_json(row),
             'prediction': row[12],
             'status': row[13],
             'confidence': row[14],
@@ -143,29 +469,86 @@ def get_user_predictions(user_id: int) -> List[Dict]:
         })
     return predictions
 
+@_instrumented
 def delete_prediction(prediction_id: int, user_id: int) -> bool:
     """Delete a specific prediction"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+    def delete(c):
+        _summarize_deleted(c, user_id, 'AND id = ?', (prediction_id,))
         c.execute('DELETE FROM predictions WHERE id = ? AND user_id = ?', 
                   (prediction_id, user_id))
-        conn.commit()
-        conn.close()
+        _refresh_summary_bounds(c, user_id)
+
+    try:
+        _run(delete, commit=True)
         return True
     except Exception as e:
         print(f"Error deleting prediction: {e}")
         return False
 
+@_instrumented
 def clear_user_history(user_id: int) -> bool:
     """Clear all predictions for a user"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
+    def delete(c):
         c.execute('DELETE FROM predictions WHERE user_id = ?', (user_id,))
-        conn.commit()
-        conn.close()
+        c.execute('DELETE FROM prediction_summary WHERE user_id = ?', (user_id,))
+
+    try:
+        _run(delete, commit=True)
         return True
     except Exception as e:
         print(f"Error clearing history: {e}")
         return False
+
+SUMMARY_COLUMNS = SUMMARY_SUMS + ('first_at', 'last_at')
+
+@_instrumented
+def get_user_summary(user_id: int) -> Optional[Dict]:
+    """The user's history summary row (counts, sums, first/last timestamp), or None without predictions"""
+    row = _run(lambda c: c.execute(f'SELECT {", ".join(SUMMARY_COLUMNS)} FROM prediction_summary WHERE user_id = ?',
+                                   (user_id,)).fetchone())
+    return dict(zip(SUMMARY_COLUMNS, row)) if row else None
+
+# History exports read the predictions table this many rows at a time
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 1000))
+EXPORT_COLUMNS = ('id', 'username', 'created_at', 'age', 'gender', 'tb', 'db', 'alkphos', 'sgpt', 'sgot', 'tp',
+                  'alb', 'ag_ratio', 'prediction', 'status', 'confidence')
+
+def iter_predictions(user_id: Optional[int] = None, start: Optional[str] = None, end: Optional[str] = None,
+                     chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """Yield lists of up to chunk_rows prediction rows (EXPORT_COLUMNS), oldest first.
+
+    One user's rows, or everyone's when user_id is None, created at or after
+    `start` and before `end` ('YYYY-MM-DD HH:MM:SS' UTC, like created_at).
+    Rows come from one cursor with fetchmany, ordered by an index, so memory
+    stays at one chunk. The cursor runs on its own connection, since a
+    streamed response may resume the generator on any thread: one read
+    snapshot for the whole export, which in WAL mode blocks no writer.
+    """
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append('p.user_id = ?')
+        params.append(user_id)
+    if start is not None:
+        conditions.append('p.created_at >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('p.created_at < ?')
+        params.append(end)
+    sql = f'''SELECT {', '.join(('p.id', 'u.username') + tuple(f'p.{column}' for column in EXPORT_COLUMNS[2:]))}
+              FROM predictions p LEFT JOIN users u ON u.id = p.user_id
+              {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+              ORDER BY p.created_at, p.id'''
+
+    latency = DB_LATENCY.labels('iter_predictions')
+    conn = _connect()
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            started = time.perf_counter()
+            rows = cursor.fetchmany(chunk_rows)
+            latency.observe(time.perf_counter() - started)
+            if not rows:
+                return
+            yield rows
+    finally:
+        conn.close()
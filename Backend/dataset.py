@@ -0,0 +1,164 @@
+"""
+Preprocessed, memory-mappable cache of the ILPD training data
+The CSV is parsed once: Gender is mapped to 0/1, rows with missing values are
+dropped and the numeric columns are clipped to their IQR fences, all with
+vectorized NumPy operations. The feature matrix and labels are written as raw
+.npy files next to a meta.json holding the clipping bounds and the CSV's
+sha256, and are rebuilt only when the CSV (or the preparation) changes.
+Run from the Backend folder to (re)build it: python dataset.py
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+DATASET_CSV = os.path.join(os.path.dirname(__file__), 'Indian Liver Patient Dataset (ILPD).csv')
+DATASET_CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'data_cache'))
+
+# Bump when the preparation below changes, so existing caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+META_NAME = 'meta.json'
+
+FEATURE_COLUMNS = ['Age', 'Gender', 'Total_Bilirubin', 'Direct_Bilirubin', 'Alkaline_Phosphotase',
+                   'Alamine_Aminotransferase', 'Aspartate_Aminotransferase', 'Total_Proteins', 'Albumin',
+                   'Albumin_and_Globulin_Ratio']
+LABEL_COLUMN = 'is_patient'
+# Every feature except Gender is clipped to [Q1 - 1.5 IQR, Q3 + 1.5 IQR]
+CLIPPED_COLUMNS = [column for column in FEATURE_COLUMNS if column != 'Gender']
+IQR_FACTOR = 1.5
+MALE_VALUES = ['M', 'MALE']
+
+
+class Dataset:
+    """Prepared ILPD data: X (N x 10, FEATURE_COLUMNS order), y (1 = patient) and meta.json"""
+
+    def __init__(self, X, y, meta):
+        self.X = X
+        self.y = y
+        self.meta = meta
+
+    @property
+    def bounds(self):
+        """{column: (lower, upper)} clipping bounds computed from the data"""
+        return {column: tuple(bounds) for column, bounds in self.meta['clip_bounds'].items()}
+
+    def frame(self):
+        """(X, y) as a DataFrame with FEATURE_COLUMNS and a Series, as the training code expects"""
+        return pd.DataFrame(self.X, columns=FEATURE_COLUMNS), pd.Series(self.y, name=LABEL_COLUMN)
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def prepare(csv_path):
+    """Parse and clean the CSV; returns (X, y, clip_bounds)"""
+    numeric = {column: 'float64' for column in FEATURE_COLUMNS + [LABEL_COLUMN] if column != 'Gender'}
+    df = pd.read_csv(csv_path, dtype={**numeric, 'Gender': 'string'})
+    df.columns = FEATURE_COLUMNS + [LABEL_COLUMN]
+
+    # Vectorized Gender mapping; a missing Gender stays missing and drops the row below
+    gender = df['Gender'].str.strip().str.upper()
+    X = df[FEATURE_COLUMNS].drop(columns='Gender').to_numpy(dtype=float)
+    X = np.insert(X, FEATURE_COLUMNS.index('Gender'),
+                  np.where(gender.isna(), np.nan, gender.isin(MALE_VALUES).astype(float)), axis=1)
+    labels = df[LABEL_COLUMN].to_numpy(dtype=float)
+
+    # Drop rows with any missing value
+    keep = ~(np.isnan(X).any(axis=1) | np.isnan(labels))
+    X, labels = X[keep], labels[keep]
+
+    # IQR fences for all clipped columns at once
+    clipped = [FEATURE_COLUMNS.index(column) for column in CLIPPED_COLUMNS]
+    q1, q3 = np.quantile(X[:, clipped], [0.25, 0.75], axis=0)
+    lower, upper = q1 - IQR_FACTOR * (q3 - q1), q3 + IQR_FACTOR * (q3 - q1)
+    X[:, clipped] = np.clip(X[:, clipped], lower, upper)
+
+    y = (labels == 1).astype(np.int64)
+    clip_bounds = {column: [float(low), float(high)] for column, low, high in zip(CLIPPED_COLUMNS, lower, upper)}
+    return np.ascontiguousarray(X), y, clip_bounds
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, META_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _is_current(meta, csv_path, stat):
+    """Does the cache in `meta` belong to this CSV? Hashes the CSV only if its size or mtime changed"""
+    if meta is None or meta.get('format_version') != CACHE_FORMAT_VERSION:
+        return False, None
+    if meta['source_size'] == stat.st_size and meta['source_mtime_ns'] == stat.st_mtime_ns:
+        return True, None
+    source_sha256 = file_sha256(csv_path)
+    return meta['source_sha256'] == source_sha256, source_sha256
+
+
+def build_cache(csv_path=DATASET_CSV, cache_dir=DATASET_CACHE_DIR, source_sha256=None):
+    """Prepare the CSV and write X.npy, y.npy and meta.json to cache_dir; returns the meta"""
+    stat = os.stat(csv_path)
+    X, y, clip_bounds = prepare(csv_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(os.path.join(cache_dir, 'X.npy'), X, allow_pickle=False)
+    np.save(os.path.join(cache_dir, 'y.npy'), y, allow_pickle=False)
+    meta = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'source': os.path.basename(csv_path),
+        'source_sha256': source_sha256 or file_sha256(csv_path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'rows': int(X.shape[0]),
+        'features': FEATURE_COLUMNS,
+        'iqr_factor': IQR_FACTOR,
+        'clip_bounds': clip_bounds,
+    }
+    # meta.json last: a directory without one is an incomplete build
+    with open(os.path.join(cache_dir, META_NAME), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_dataset(csv_path=DATASET_CSV, cache_dir=DATASET_CACHE_DIR, rebuild=False, mmap=True):
+    """The prepared dataset, from the cache when it matches the CSV, else rebuilt first.
+
+    With mmap=True the arrays are memory-mapped read-only rather than read.
+    """
+    stat = os.stat(csv_path)
+    meta = _read_meta(cache_dir)
+    current, source_sha256 = (False, None) if rebuild else _is_current(meta, csv_path, stat)
+    if not current:
+        meta = build_cache(csv_path, cache_dir, source_sha256)
+        print(f"✅ Prepared {meta['rows']} rows from {meta['source']} into {os.path.basename(cache_dir)}/")
+    elif source_sha256 is not None:
+        # Same content with a new mtime (copied or touched): remember it to skip hashing next time
+        meta.update(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns)
+        with open(os.path.join(cache_dir, META_NAME), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    mmap_mode = 'r' if mmap else None
+    X = np.load(os.path.join(cache_dir, 'X.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+    y = np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+    return Dataset(X, y, meta)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the preprocessed ILPD cache")
+    parser.add_argument('--csv', default=DATASET_CSV)
+    parser.add_argument('--cache-dir', default=DATASET_CACHE_DIR)
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild even if the cache matches the CSV")
+    args = parser.parse_args()
+    data = load_dataset(args.csv, args.cache_dir, rebuild=args.rebuild)
+    print(f"✅ {data.X.shape[0]} rows x {data.X.shape[1]} features, {int(data.y.sum())} patients "
+          f"(source sha256 {data.meta['source_sha256'][:12]})")
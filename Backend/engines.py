@@ -0,0 +1,489 @@
+"""
+NumPy inference engines for the voting ensemble models
+Each engine takes already-scaled input (see FusedEnsemble.transform)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+EPS32 = float(np.finfo(np.float32).eps)
+
+# Rows are scored in chunks so the per-chunk intermediate arrays stay small
+ENGINE_CHUNK_SIZE = 4096
+
+# Threads an engine may use per worker process; single rows always stay on the calling thread
+ENGINE_THREADS = int(os.environ.get('ENGINE_THREADS', 1))
+
+# Calls with at least this many rows go to the reference forest's compiled tree
+# walk, which beats the QuickScorer tables from about 512 rows on one core
+RF_REFERENCE_MIN_ROWS = int(os.environ.get('RF_REFERENCE_MIN_ROWS', 512))
+
+_thread_pools = {}
+if hasattr(os, 'register_at_fork'):
+    # Pool threads do not survive a fork; a forked worker starts its own pools
+    os.register_at_fork(after_in_child=_thread_pools.clear)
+
+
+def _map_chunks(fn, X, chunk_size, n_threads, out):
+    """Fill `out` row-chunk by row-chunk, spreading chunks over at most n_threads threads"""
+    starts = range(0, X.shape[0], chunk_size)
+    if n_threads <= 1 or X.shape[0] <= chunk_size:
+        for start in starts:
+            out[start:start + chunk_size] = fn(X[start:start + chunk_size])
+        return out
+
+    if n_threads not in _thread_pools:
+        _thread_pools[n_threads] = ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix='engine')
+    for start, result in zip(starts, _thread_pools[n_threads].map(lambda s: fn(X[s:s + chunk_size]), starts)):
+        out[start:start + chunk_size] = result
+    return out
+
+
+class KNNEngine:
+    """Uniform-weight KNN over one contiguous float32 training matrix.
+
+    Squared distances come from a single matrix product per chunk
+    (|q|^2 - 2 q.x + |x|^2). With tie_breaking='sklearn' every row whose k-th
+    and (k+1)-th neighbour distances are within the float32 error bound
+    (including exact ties between duplicate training rows) is re-scored by the
+    reference KNeighborsClassifier, so labels match sklearn exactly. Without a
+    reference (e.g. loaded from a model artifact) those rows are re-scored with
+    exact float64 distances, equal distances keeping the lower training index.
+    tie_breaking='fast' keeps the float32 neighbour set for every row.
+    """
+
+    def __init__(self, X_train, y_train, classes, n_neighbors, reference=None,
+                 tie_breaking='sklearn', chunk_size=ENGINE_CHUNK_SIZE):
+        if tie_breaking not in ('sklearn', 'fast'):
+            raise ValueError(f"Unknown tie_breaking mode: {tie_breaking}")
+        # float64 training rows for the exact re-check; the float32 copy is the hot path
+        self.fit_X = np.asarray(X_train, dtype=np.float64)
+        self.X_train = np.ascontiguousarray(X_train, dtype=np.float32)
+        self.y_train = np.ascontiguousarray(y_train, dtype=np.intp)
+        self.classes_ = np.asarray(classes)
+        self.n_neighbors = int(n_neighbors)
+        self.reference = reference
+        self.tie_breaking = tie_breaking
+        self.chunk_size = chunk_size
+        self.train_sq_norms = np.einsum('ij,ij->i', self.X_train, self.X_train)
+        # Bound on the float32 squared-distance error relative to |q|^2 + max|x|^2
+        self.error_scale = 8 * (self.X_train.shape[1] + 4) * EPS32
+        self.max_train_sq_norm = float(self.train_sq_norms.max())
+
+    @classmethod
+    def from_estimator(cls, knn, **kwargs):
+        """Build from a fitted KNeighborsClassifier (kept as the tie-breaking reference)"""
+        if knn.weights != 'uniform' or knn.effective_metric_ != 'euclidean':
+            raise ValueError("KNNEngine supports uniform weights with the euclidean metric only")
+        return cls(knn._fit_X, knn._y, knn.classes_, knn.n_neighbors, reference=knn, **kwargs)
+
+    def _label_counts(self, neighbors):
+        labels = self.y_train[neighbors]
+        return (labels[:, :, None] == np.arange(len(self.classes_))).sum(axis=1)
+
+    def _nearest(self, sq_dist, n):
+        """Indices and squared distances of the n nearest training rows, closest first"""
+        if n > 16:
+            nearest = np.argpartition(sq_dist, n - 1, axis=1)[:, :n]
+            nearest_dist = np.take_along_axis(sq_dist, nearest, axis=1)
+            order = np.argsort(nearest_dist, axis=1, kind='stable')
+            return np.take_along_axis(nearest, order, axis=1), np.take_along_axis(nearest_dist, order, axis=1)
+
+        # For small k repeated argmin passes beat a full argpartition
+        rows = np.arange(sq_dist.shape[0])
+        nearest = np.empty((sq_dist.shape[0], n), dtype=np.intp)
+        nearest_dist = np.empty((sq_dist.shape[0], n), dtype=sq_dist.dtype)
+        for j in range(n):
+            nearest[:, j] = sq_dist.argmin(axis=1)
+            nearest_dist[:, j] = sq_dist[rows, nearest[:, j]]
+            sq_dist[rows, nearest[:, j]] = np.inf
+        return nearest, nearest_dist
+
+    def _chunk_counts(self, X):
+        k = self.n_neighbors
+        Q = X.astype(np.float32)
+        q_sq_norms = np.einsum('ij,ij->i', Q, Q)
+        sq_dist = Q @ self.X_train.T
+        sq_dist *= -2
+        sq_dist += self.train_sq_norms
+        sq_dist += q_sq_norms[:, None]
+
+        if k >= self.X_train.shape[0]:
+            return self._label_counts(np.broadcast_to(np.arange(self.X_train.shape[0]), sq_dist.shape))
+
+        nearest, nearest_dist = self._nearest(sq_dist, k + 1)
+        counts = self._label_counts(nearest[:, :k])
+
+        if self.tie_breaking == 'sklearn':
+            tolerance = self.error_scale * (q_sq_norms.astype(np.float64) + self.max_train_sq_norm)
+            ambiguous = (nearest_dist[:, k].astype(np.float64) - nearest_dist[:, k - 1]) <= 2 * tolerance
+            if ambiguous.any():
+                if self.reference is not None:
+                    neighbors = self.reference.kneighbors(X[ambiguous], return_distance=False)
+                else:
+                    neighbors = self._exact_neighbors(X[ambiguous])
+                counts[ambiguous] = self._label_counts(neighbors)
+
+        return counts
+
+    def _exact_neighbors(self, X):
+        """k nearest training rows by exact float64 distance (few rows only)"""
+        sq_dist = ((X[:, None, :] - self.fit_X[None, :, :]) ** 2).sum(axis=2)
+        return np.argsort(sq_dist, axis=1, kind='stable')[:, :self.n_neighbors]
+
+    def _neighbor_counts(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        counts = np.empty((X.shape[0], len(self.classes_)), dtype=np.intp)
+        for start in range(0, X.shape[0], self.chunk_size):
+            counts[start:start + self.chunk_size] = self._chunk_counts(X[start:start + self.chunk_size])
+        return counts
+
+    def predict(self, X):
+        """Majority label among the k nearest neighbours (lowest class wins ties, as in sklearn)"""
+        return self.classes_[self._neighbor_counts(X).argmax(axis=1)]
+
+    def predict_proba(self, X):
+        return self._neighbor_counts(X) / self.n_neighbors
+
+
+class RandomForestEngine:
+    """All trees of a RandomForestClassifier packed into flat node arrays.
+
+    The flat arrays (feature, threshold, left, right, value) are walked level
+    by level for every row and tree at once; leaves point to themselves so
+    finished rows stay put. When they fit in `table_budget_mb`, per-feature
+    QuickScorer tables are derived from the same arrays: thresholds sorted per
+    feature plus prefix-ANDed leaf bitmasks, so a row's exit leaf in every tree
+    is found with one searchsorted and one gather per feature.
+
+    Inputs are cast to float32 and leaf class fractions are summed tree by
+    tree in estimator order, exactly as RandomForestClassifier.predict_proba
+    does with a single job, so predictions are bit-identical. The tables win
+    on small batches; from `reference_min_rows` rows on, a reference forest
+    (kept by from_estimator) is faster, so its trees are summed in the same
+    order instead. n_threads caps the threads used for large batches
+    (None = ENGINE_THREADS).
+    """
+
+    # Engines pickled before the reference was kept have none
+    reference = None
+    reference_min_rows = RF_REFERENCE_MIN_ROWS
+
+    def __init__(self, feature, threshold, children_left, children_right, value, roots,
+                 classes, max_depth, missing_go_to_left=None, n_threads=None,
+                 chunk_size=256, table_budget_mb=64, reference=None, reference_min_rows=RF_REFERENCE_MIN_ROWS):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.children_left = np.ascontiguousarray(children_left, dtype=np.intp)
+        self.children_right = np.ascontiguousarray(children_right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.missing_go_to_left = None if missing_go_to_left is None else np.asarray(missing_go_to_left, dtype=bool)
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.n_threads = n_threads
+        self.chunk_size = chunk_size
+        self.table_budget_mb = table_budget_mb
+        self.reference = reference
+        self.reference_min_rows = reference_min_rows
+        self._tables = None
+
+    @classmethod
+    def from_estimator(cls, rf, **kwargs):
+        """Flatten a fitted RandomForestClassifier (single output), kept as the reference for large batches"""
+        if rf.n_outputs_ != 1:
+            raise ValueError("RandomForestEngine supports single-output forests only")
+
+        feature, threshold, left, right, value, roots, missing = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in rf.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            roots.append(offset)
+            # Leaves point to themselves, so extra traversal steps are no-ops
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            value.append(tree.value[:, 0, :rf.n_classes_])
+            missing.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8)))
+            offset += tree.node_count
+
+        value = np.concatenate(value)
+        sums = value.sum(axis=1, keepdims=True)
+        if not np.allclose(sums, 1.0):
+            # scikit-learn < 1.4 stores weighted class counts and normalises them in predict_proba
+            sums[sums == 0.0] = 1.0
+            value = value / sums
+
+        kwargs.setdefault('reference', rf)
+        return cls(
+            np.concatenate(feature), np.concatenate(threshold), np.concatenate(left), np.concatenate(right),
+            value, roots, rf.classes_, max(e.tree_.max_depth for e in rf.estimators_),
+            missing_go_to_left=np.concatenate(missing), **kwargs
+        )
+
+    def __getstate__(self):
+        # The QuickScorer tables are derived data; rebuild them after unpickling
+        state = self.__dict__.copy()
+        state['_tables'] = None
+        return state
+
+    def _chunk_proba_reference(self, X):
+        """The reference forest's trees summed one after another, as predict_proba does with one job"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        proba = np.zeros((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for estimator in self.reference.estimators_:
+            proba += estimator.predict_proba(X, check_input=False)
+        proba /= len(self.roots)
+        return proba
+
+    def _build_tables(self):
+        """Derive the QuickScorer tables, or return False when they exceed the memory budget"""
+        n_trees = len(self.roots)
+        n_features = int(self.feature.max()) + 1
+        is_leaf = self.children_left == np.arange(len(self.children_left))
+
+        tree_leaves, splits = [], []
+        for tree, root in enumerate(self.roots):
+            # Depth-first walk: leaves in left-to-right order, and for every split
+            # the range of leaf positions covered by its left subtree
+            leaves, first_leaf, stack = [], {}, [(root, False)]
+            while stack:
+                node, left_done = stack.pop()
+                if is_leaf[node]:
+                    leaves.append(node)
+                elif not left_done:
+                    first_leaf[node] = len(leaves)
+                    stack.append((node, True))
+                    stack.append((self.children_left[node], False))
+                else:
+                    splits.append((self.feature[node], self.threshold[node], tree, first_leaf[node], len(leaves)))
+                    stack.append((self.children_right[node], False))
+            tree_leaves.append(leaves)
+
+        n_words = (max(len(leaves) for leaves in tree_leaves) + 63) // 64
+        table_bytes = (len(splits) + n_features) * n_trees * n_words * 8
+        if table_bytes > self.table_budget_mb * 1024 * 1024:
+            return False
+
+        # Exit-leaf position -> global node id (padding repeats the last leaf, never selected)
+        leaf_nodes = np.empty((n_trees, n_words * 64), dtype=np.intp)
+        for tree, leaves in enumerate(tree_leaves):
+            leaf_nodes[tree, :len(leaves)] = leaves
+            leaf_nodes[tree, len(leaves):] = leaves[-1]
+
+        word_bits = np.uint64(0xFFFFFFFFFFFFFFFF)
+        thresholds, masks = [], []
+        for f in range(n_features):
+            feature_splits = sorted((s for s in splits if s[0] == f), key=lambda s: s[1])
+            table = np.empty((len(feature_splits) + 1, n_trees, n_words), dtype=np.uint64)
+            current = np.full((n_trees, n_words), word_bits)
+            table[0] = current
+            for j, (_, _, tree, lo, hi) in enumerate(feature_splits):
+                # x > threshold: the row leaves this split to the right, so no leaf
+                # of the left subtree can be its exit leaf
+                cleared = ((1 << hi) - 1) ^ ((1 << lo) - 1)
+                for w in range(n_words):
+                    current[tree, w] &= ~np.uint64((cleared >> (64 * w)) & 0xFFFFFFFFFFFFFFFF)
+                table[j + 1] = current
+            thresholds.append(np.array([s[1] for s in feature_splits], dtype=np.float64))
+            masks.append(table)
+
+        return thresholds, masks, leaf_nodes
+
+    def _exit_leaves_tables(self, X, tables):
+        """Exit leaf node of every tree per row via the QuickScorer tables (NaN-free X)"""
+        thresholds, masks, leaf_nodes = tables
+        X = X.astype(np.float64)
+        # Number of splits with threshold < x, i.e. the splits the row leaves to the right
+        leaf_mask = masks[0].take(np.searchsorted(thresholds[0], X[:, 0]), axis=0)
+        split_mask = np.empty_like(leaf_mask)
+        for f in range(1, len(masks)):
+            masks[f].take(np.searchsorted(thresholds[f], X[:, f]), axis=0, out=split_mask)
+            leaf_mask &= split_mask
+
+        # Exit leaf = lowest surviving bit
+        if leaf_mask.shape[2] == 1:
+            word_index = 0
+            word = leaf_mask[:, :, 0]
+        elif leaf_mask.shape[2] == 2:
+            first_empty = leaf_mask[:, :, 0] == 0
+            word_index = first_empty * 1
+            word = np.where(first_empty, leaf_mask[:, :, 1], leaf_mask[:, :, 0])
+        else:
+            word_index = (leaf_mask != 0).argmax(axis=2)
+            word = np.take_along_axis(leaf_mask, word_index[:, :, None], axis=2)[:, :, 0]
+        lowest_bit = word & (~word + np.uint64(1))
+        position = np.frexp(lowest_bit.astype(np.float64))[1] - 1 + 64 * word_index
+        return leaf_nodes[np.arange(len(self.roots)), position]
+
+    def _exit_leaves_walk(self, X):
+        """Exit leaf node of every tree per row by level-wise traversal of the node arrays"""
+        n_rows, n_features = X.shape
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        X_flat = X.ravel()
+
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X_flat[row_offsets + self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if self.missing_go_to_left is not None:
+                go_left |= np.isnan(x) & self.missing_go_to_left[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def _chunk_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if self._tables is None:
+            self._tables = self._build_tables()
+
+        if self._tables and not np.isnan(X).any():
+            leaves = self._exit_leaves_tables(X, self._tables)
+        else:
+            leaves = self._exit_leaves_walk(X)
+
+        # cumsum adds the trees one after another, the same order as sklearn
+        proba = np.cumsum(self.value[leaves], axis=1)[:, -1]
+        proba /= len(self.roots)
+        return proba
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        out = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        n_threads = ENGINE_THREADS if self.n_threads is None else self.n_threads
+        if self.reference is not None and X.shape[0] >= self.reference_min_rows:
+            return _map_chunks(self._chunk_proba_reference, X, ENGINE_CHUNK_SIZE, n_threads, out)
+        return _map_chunks(self._chunk_proba, X, self.chunk_size, n_threads, out)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+class SVMEngine:
+    """Binary SVC decision function as plain matrix products.
+
+    A linear SVC collapses to one weight vector w = dual_coef . SV and a bias
+    (the support vectors are kept only so the engine can be exported).
+    An RBF SVC keeps the support-vector matrix, its squared norms and the
+    dual coefficients, and evaluates exp(-gamma |x - sv|^2) for a whole chunk
+    with one matrix product. With a reference SVC, rows whose decision value
+    is within the floating-point error bound of 0 are re-scored by it, so
+    predictions match SVC.predict exactly. Platt scaling is only applied in
+    predict_proba, when probabilities are actually asked for.
+    """
+
+    def __init__(self, kernel, support_vectors, dual_coef, intercept, classes, gamma=None,
+                 prob_a=None, prob_b=None, reference=None, chunk_size=ENGINE_CHUNK_SIZE):
+        if kernel not in ('linear', 'rbf'):
+            raise ValueError(f"SVMEngine supports linear and rbf kernels, not {kernel}")
+        support_vectors = np.asarray(support_vectors, dtype=np.float64)
+        dual_coef = np.asarray(dual_coef, dtype=np.float64).ravel()
+        self.kernel = kernel
+        self.intercept = float(np.ravel(intercept)[0])
+        self.classes_ = np.asarray(classes)
+        self.gamma = gamma
+        self.prob_a = prob_a
+        self.prob_b = prob_b
+        self.reference = reference
+        self.chunk_size = chunk_size
+        self.n_support = support_vectors.shape[0]
+        self.error_scale = 8 * (support_vectors.shape[1] + self.n_support + 4) * float(np.finfo(np.float64).eps)
+
+        # Both kernels keep the support vectors and dual coefficients so they can be exported
+        self.support_vectors = np.ascontiguousarray(support_vectors)
+        self.dual_coef = dual_coef
+        if kernel == 'linear':
+            self.weights = dual_coef @ support_vectors
+            self.coef_norm_sum = float(np.abs(dual_coef) @ np.linalg.norm(support_vectors, axis=1))
+        else:
+            self.sv_sq_norms = np.einsum('ij,ij->i', support_vectors, support_vectors)
+            self.coef_abs_sum = float(np.abs(dual_coef).sum())
+            self.max_sv_sq_norm = float(self.sv_sq_norms.max())
+
+    @classmethod
+    def from_estimator(cls, svc, **kwargs):
+        """Build from a fitted binary SVC (kept as the reference for near-zero decisions)"""
+        if len(svc.classes_) != 2:
+            raise ValueError("SVMEngine supports binary classification only")
+        probability = len(getattr(svc, 'probA_', ())) > 0
+        return cls(
+            svc.kernel, svc.support_vectors_, svc.dual_coef_, svc.intercept_, svc.classes_,
+            gamma=svc._gamma, prob_a=svc.probA_[0] if probability else None,
+            prob_b=svc.probB_[0] if probability else None, reference=svc, **kwargs
+        )
+
+    def _chunk_decision(self, X):
+        """Decision values and their error bounds for one chunk"""
+        if self.kernel == 'linear':
+            decision = X @ self.weights + self.intercept
+            tolerance = self.error_scale * (np.linalg.norm(X, axis=1) * self.coef_norm_sum + abs(self.intercept))
+            return decision, tolerance
+
+        x_sq_norms = np.einsum('ij,ij->i', X, X)
+        sq_dist = X @ self.support_vectors.T
+        sq_dist *= -2
+        sq_dist += self.sv_sq_norms
+        sq_dist += x_sq_norms[:, None]
+        np.maximum(sq_dist, 0, out=sq_dist)
+        sq_dist *= -self.gamma
+        kernel = np.exp(sq_dist, out=sq_dist)
+        decision = kernel @ self.dual_coef + self.intercept
+        tolerance = self.error_scale * (
+            self.coef_abs_sum * (1 + self.gamma * (x_sq_norms + self.max_sv_sq_norm)) + abs(self.intercept)
+        )
+        return decision, tolerance
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        decision = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], self.chunk_size):
+            decision[start:start + self.chunk_size] = self._chunk_decision(X[start:start + self.chunk_size])[0]
+        return decision
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        predictions = np.empty(X.shape[0], dtype=self.classes_.dtype)
+        for start in range(0, X.shape[0], self.chunk_size):
+            chunk = X[start:start + self.chunk_size]
+            decision, tolerance = self._chunk_decision(chunk)
+            labels = self.classes_[(decision > 0).astype(np.intp)]
+            ambiguous = np.abs(decision) <= tolerance
+            if self.reference is not None and ambiguous.any():
+                labels[ambiguous] = self.reference.predict(chunk[ambiguous])
+            predictions[start:start + self.chunk_size] = labels
+        return predictions
+
+    def predict_proba(self, X):
+        """Platt-scaled class probabilities (requires an SVC trained with probability=True)
+
+        Follows libsvm's svm_predict_probability for two classes: the sigmoid
+        of libsvm's decision value (-decision_function), clipped to
+        [1e-7, 1 - 1e-7], then the same pairwise-coupling iterations.
+        """
+        if self.prob_a is None:
+            raise AttributeError("predict_proba is not available when probability=False")
+        f_ab = -self.decision_function(X) * self.prob_a + self.prob_b
+        with np.errstate(over='ignore'):
+            r = np.where(f_ab >= 0, np.exp(-f_ab) / (1.0 + np.exp(-f_ab)), 1.0 / (1.0 + np.exp(f_ab)))
+        r = np.clip(r, 1e-7, 1 - 1e-7)
+
+        # multiclass_probability() with k = 2, run per row until that row converges
+        q = np.array([[(1 - r) ** 2, -(1 - r) * r], [-(1 - r) * r, r ** 2]])
+        p = np.full((2, len(r)), 0.5)
+        active = np.ones(len(r), dtype=bool)
+        for _ in range(100):
+            qp = np.einsum('tjn,jn->tn', q, p)
+            pqp = (p * qp).sum(axis=0)
+            active &= np.abs(qp - pqp).max(axis=0) >= 0.005 / 2
+            if not active.any():
+                break
+            for t in range(2):
+                diff = np.where(active, (-qp[t] + pqp) / q[t, t], 0.0)
+                p[t] += diff
+                pqp = (pqp + diff * (diff * q[t, t] + 2 * qp[t])) / (1 + diff) / (1 + diff)
+                qp = (qp + diff * q[t]) / (1 + diff)
+                p /= (1 + diff)
+        return p.T
@@ -0,0 +1,230 @@
+"""
+Vectorized scoring for the voting ensemble (KNN + Random Forest + SVM)
+Scores a whole N x 10 feature matrix with one predict call per model
+"""
+
+import os
+import time
+import numpy as np
+from engines import KNNEngine, RandomForestEngine, SVMEngine
+from metrics import MODEL_INFERENCE, VOTE_AGREEMENT
+import profiling
+
+# Largest number of rows handed to the models in one call; bigger batches are
+# scored chunk by chunk so a huge request does not spike memory
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 4096))
+
+MODEL_NAMES = ('knn', 'rf', 'svm')
+
+# Marks a model that lazy voting did not need to evaluate
+NOT_EVALUATED = -1
+
+
+def check_finite(X):
+    """Raise ValueError, with sklearn's messages, if X holds NaN or infinite values"""
+    X = np.asarray(X, dtype=float)
+    if not np.isfinite(X).all():
+        if np.isnan(X).any():
+            raise ValueError("Input X contains NaN.")
+        raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+
+
+def majority_vote(knn_preds, rf_preds, svm_preds):
+    """Combine per-model predictions with 2-of-3 majority voting.
+
+    Returns the ensemble predictions and the agreement confidence (0-100).
+    """
+    votes = np.stack([knn_preds, rf_preds, svm_preds]).astype(int)
+    predictions = (votes.sum(axis=0) >= 2).astype(int)
+    agreement_count = (votes == predictions).sum(axis=0)
+    confidence = (agreement_count / 3) * 100
+    return predictions, confidence
+
+
+class FusedEnsemble:
+    """KNN, Random Forest and SVM sharing one fitted RobustScaler.
+
+    All three training pipelines are fit on the same X_train, so their scalers
+    are identical. The input is scaled once and fanned out to the bare
+    estimators instead of running the same transform three times.
+    rf and svm are None when only the fallback KNN model is available.
+    """
+
+    def __init__(self, scaler, knn, rf=None, svm=None, model_costs=None):
+        self.scaler = scaler
+        self.knn = knn
+        self.rf = rf
+        self.svm = svm
+        # {'row': {...}, 'batch': {...}} seconds per row for each model, see measure_costs()
+        self.model_costs = model_costs
+
+    @classmethod
+    def from_pipelines(cls, knn_pipeline, rf_pipeline=None, svm_pipeline=None, engines=False):
+        """Build from the scaler + estimator pipelines, checking that their scalers are equal.
+
+        With engines=True the bare estimators are replaced by the NumPy
+        inference engines from engines.py, which give identical predictions.
+        """
+        pipelines = [p for p in (knn_pipeline, rf_pipeline, svm_pipeline) if p is not None]
+        scaler = pipelines[0].steps[0][1]
+        for pipeline in pipelines[1:]:
+            other = pipeline.steps[0][1]
+            if not (np.array_equal(scaler.center_, other.center_) and np.array_equal(scaler.scale_, other.scale_)):
+                raise ValueError("Pipeline scalers differ; the ensemble cannot share one scaler")
+
+        knn = knn_pipeline.steps[-1][1]
+        rf = rf_pipeline.steps[-1][1] if rf_pipeline is not None else None
+        svm = svm_pipeline.steps[-1][1] if svm_pipeline is not None else None
+        if engines:
+            knn = KNNEngine.from_estimator(knn)
+            rf = RandomForestEngine.from_estimator(rf) if rf is not None else None
+            svm = SVMEngine.from_estimator(svm) if svm is not None else None
+
+        return cls(scaler, knn, rf, svm)
+
+    @property
+    def is_voting(self) -> bool:
+        return self.rf is not None and self.svm is not None
+
+    def transform(self, X):
+        """Apply the shared RobustScaler (same arithmetic as RobustScaler.transform).
+
+        Non-finite values raise ValueError like sklearn's input validation:
+        the engines would otherwise return a confident vote for them.
+        """
+        X = np.array(X, dtype=float)
+        check_finite(X)
+        if self.scaler.with_centering:
+            X -= self.scaler.center_
+        if self.scaler.with_scaling:
+            X /= self.scaler.scale_
+        return X
+
+    def _predict(self, name, X_scaled):
+        """One model's predictions, timed into model_inference_seconds and the request profile"""
+        start = time.perf_counter()
+        predictions = getattr(self, name).predict(X_scaled)
+        elapsed = time.perf_counter() - start
+        MODEL_INFERENCE.labels(name).observe(elapsed)
+        profiling.record(f'predict_{name}', elapsed)
+        return predictions
+
+    def predict_votes(self, X):
+        """Scale X once and return the KNN, RF and SVM predictions"""
+        X_scaled = self.transform(X)
+        return self._predict('knn', X_scaled), self._predict('rf', X_scaled), self._predict('svm', X_scaled)
+
+    def measure_costs(self, X_scaled=None, repeats=20):
+        """Record each model's cost as seconds per row, for a single row and for a batch.
+
+        X_scaled defaults to synthetic scaled rows; timings barely depend on the values.
+        """
+        if X_scaled is None:
+            X_scaled = np.random.default_rng(0).normal(size=(256, len(self.scaler.center_)))
+        costs = {'row': {}, 'batch': {}}
+        for name in MODEL_NAMES:
+            model = getattr(self, name)
+            row_timings = []
+            for i in range(repeats):
+                start = time.perf_counter()
+                model.predict(X_scaled[i % len(X_scaled)][None, :])
+                row_timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for _ in range(3):
+                model.predict(X_scaled)
+            costs['row'][name] = float(np.median(row_timings))
+            costs['batch'][name] = (time.perf_counter() - start) / (3 * len(X_scaled))
+        self.model_costs = costs
+        return costs
+
+    def cost_order(self, n_rows):
+        """Model names from cheapest to most expensive for a chunk of n_rows"""
+        costs = getattr(self, 'model_costs', None)
+        if not costs:
+            return MODEL_NAMES
+        profile = costs['row'] if n_rows == 1 else costs['batch']
+        return tuple(sorted(MODEL_NAMES, key=lambda name: profile[name]))
+
+    def predict_lazy(self, X):
+        """Cost-ordered short-circuit voting.
+
+        The two cheapest models vote first; the third is only run on the rows
+        where they disagree (it then decides the majority). Returns
+        (predictions, confidence, votes) with NOT_EVALUATED for skipped votes
+        and confidence = agreeing models / evaluated models * 100, i.e. 100.0
+        for a 2/2 agreement and 66.67 for a 2/3 majority.
+        """
+        X_scaled = self.transform(X)
+        first, second, third = self.cost_order(X_scaled.shape[0])
+        votes = np.full((X_scaled.shape[0], 3), NOT_EVALUATED, dtype=int)
+        votes[:, MODEL_NAMES.index(first)] = self._predict(first, X_scaled)
+        votes[:, MODEL_NAMES.index(second)] = self._predict(second, X_scaled)
+
+        predictions = votes[:, MODEL_NAMES.index(first)].copy()
+        disagree = votes[:, MODEL_NAMES.index(first)] != votes[:, MODEL_NAMES.index(second)]
+        if disagree.any():
+            third_votes = self._predict(third, X_scaled[disagree])
+            votes[disagree, MODEL_NAMES.index(third)] = third_votes
+            predictions[disagree] = third_votes
+
+        evaluated = np.where(disagree, 3, 2)
+        confidence = (2 / evaluated) * 100
+        return predictions, confidence, votes
+
+    def predict_fallback(self, X):
+        """KNN-only predictions and confidence (max class probability, 0-100)"""
+        X_scaled = self.transform(X)
+        predictions = self._predict('knn', X_scaled)
+        if hasattr(self.knn, 'predict_proba'):
+            return predictions, self.knn.predict_proba(X_scaled).max(axis=1) * 100
+        return predictions, np.zeros(len(predictions))
+
+
+def predict_batch(model, X, chunk_size=BATCH_CHUNK_SIZE, lazy=False):
+    """Score a feature matrix with a FusedEnsemble in chunks of at most `chunk_size` rows.
+
+    Returns (predictions, confidence, votes) where votes is an N x 3 array of
+    the KNN, RF and SVM predictions, or None when only the fallback KNN is loaded.
+    With lazy=True the voting short-circuits (see FusedEnsemble.predict_lazy).
+    """
+    X = np.asarray(X, dtype=float)
+    n_rows = X.shape[0]
+    chunk_size = max(1, int(chunk_size))
+
+    predictions = np.zeros(n_rows, dtype=int)
+    confidence = np.zeros(n_rows, dtype=float)
+    votes = np.zeros((n_rows, 3), dtype=int) if model.is_voting else None
+
+    for start in range(0, n_rows, chunk_size):
+        chunk = X[start:start + chunk_size]
+        end = start + chunk.shape[0]
+
+        if votes is not None and lazy:
+            predictions[start:end], confidence[start:end], votes[start:end] = model.predict_lazy(chunk)
+        elif votes is not None:
+            knn_preds, rf_preds, svm_preds = model.predict_votes(chunk)
+            with profiling.stage('voting'):
+                predictions[start:end], confidence[start:end] = majority_vote(knn_preds, rf_preds, svm_preds)
+            votes[start:end] = np.column_stack([knn_preds, rf_preds, svm_preds])
+        else:
+            # Fallback to KNN only
+            predictions[start:end], confidence[start:end] = model.predict_fallback(chunk)
+
+    if votes is not None and n_rows:
+        count_agreement(votes, predictions)
+    return predictions, confidence, votes
+
+
+def count_agreement(votes, predictions):
+    """Add each row's agreeing/evaluated marker to the vote_agreement_total metric"""
+    evaluated = (votes != NOT_EVALUATED).sum(axis=1)
+    agreeing = (votes == predictions[:, None]).sum(axis=1)
+    markers, counts = np.unique(agreeing * 4 + evaluated, return_counts=True)
+    for marker, count in zip(markers, counts):
+        VOTE_AGREEMENT.labels(f"{marker // 4}/{marker % 4}").inc(int(count))
+
+
+def agreement_marker(votes_row, prediction) -> str:
+    """'agreeing/evaluated' for one row, e.g. '2/2' when lazy voting skipped the third model"""
+    evaluated = [vote for vote in votes_row if vote != NOT_EVALUATED]
+    return f"{sum(vote == prediction for vote in evaluated)}/{len(evaluated)}"
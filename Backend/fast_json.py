@@ -0,0 +1,33 @@
+"""
+JSON responses for bodies the endpoint has already built in their final shape
+Returning a Response skips FastAPI's response_model pass (validating every
+result dict again, converting it back and encoding it with json.dumps). The
+body is encoded with orjson when it is installed (pip install orjson), else
+with the standard library in the same compact form as FastAPI's JSONResponse.
+"""
+
+import json
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, as JSONResponse sends it.
+
+    orjson differs only in exponents (1e16 rather than 1e+16) and in writing
+    NaN/Infinity as null where json.dumps refuses them.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    media_type = 'application/json'
+
+    def render(self, content) -> bytes:
+        return dumps(content)
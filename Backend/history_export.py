@@ -0,0 +1,41 @@
+"""
+Streaming prediction history exports for audits, as CSV or NDJSON
+Rows arrive in chunks from database.iter_predictions and each chunk is
+encoded and sent before the next is read, so an export of millions of rows
+uses the memory of one chunk
+"""
+
+import csv
+import io
+from fast_json import dumps
+
+# Output field per database.EXPORT_COLUMNS entry
+EXPORT_FIELDS = ('id', 'username', 'timestamp', 'Age', 'Gender', 'Total_Bilirubin', 'Direct_Bilirubin',
+                 'Alkaline_Phosphotase', 'Alamine_Aminotransferase', 'Aspartate_Aminotransferase', 'Total_Proteins',
+                 'Albumin', 'Albumin_and_Globulin_Ratio', 'prediction', 'status', 'confidence')
+
+MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+def csv_chunk(rows, header=False) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(rows)
+    return out.getvalue().encode('utf-8')
+
+
+def ndjson_chunk(rows) -> bytes:
+    return b''.join(dumps(dict(zip(EXPORT_FIELDS, row))) + b'\n' for row in rows)
+
+
+def stream_export(chunks, export_format):
+    """Encode chunks of rows one at a time; a CSV export always starts with its header"""
+    if export_format == 'csv':
+        yield csv_chunk([], header=True)
+        for rows in chunks:
+            yield csv_chunk(rows)
+    else:
+        for rows in chunks:
+            yield ndjson_chunk(rows)
@@ -0,0 +1,168 @@
+"""
+Write-behind queue for prediction history
+/predict/{username} queues the history row and a background thread inserts
+queued rows in batches, so the response does not wait for a commit
+"""
+
+import threading
+import queue
+import time
+
+
+class HistoryWriter:
+    """Background writer that batches prediction history inserts.
+
+    add() queues one record (the keyword arguments of add_prediction). The
+    writer thread waits for the first queued record, keeps collecting until
+    `flush_rows` records are queued or `flush_interval_ms` has passed, and
+    hands them to `write_fn` (a list of records -> bool), which inserts them
+    in one transaction. If that fails (say the database stayed locked), each
+    record is written on its own with `write_one_fn` (a record -> bool,
+    default write_fn([record])), so one bad moment does not lose the batch.
+    When the queue is full, add() writes the record synchronously instead,
+    so records are never dropped. close() writes everything still queued.
+    flush() gives up after `flush_timeout` seconds, so a stalled writer slows
+    history reads down but never hangs them.
+    """
+
+    def __init__(self, write_fn, flush_rows: int = 100, flush_interval_ms: float = 50.0, max_queue: int = 10000,
+                 write_one_fn=None, flush_timeout: float = 5.0):
+        self.write_fn = write_fn
+        self.write_one_fn = write_one_fn or (lambda record: write_fn([record]))
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self.flush_timeout = flush_timeout
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._written_cond = threading.Condition(self._lock)
+        # Records are numbered as they are queued; the worker handles them in
+        # that order, so every record numbered up to _done has been handled
+        self._queued = 0
+        self._done = 0
+        self._flushes = 0
+        self._rows_written = 0
+        self._failed_rows = 0
+        self._fallback_rows = 0
+        self._sync_writes = 0
+        self._flush_timeouts = 0
+        self._max_depth = 0
+        self._flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._worker.start()
+
+    def add(self, record: dict) -> bool:
+        """Queue one history record; writes it synchronously if the queue is full or closed"""
+        with self._lock:
+            # Checked under the lock close() takes, so no record lands behind the stop sentinel
+            queued = False
+            if not self._closed:
+                try:
+                    self._queue.put_nowait(record)
+                    queued = True
+                    self._queued += 1
+                    self._max_depth = max(self._max_depth, self._queue.qsize())
+                except queue.Full:
+                    pass
+            if not queued:
+                self._sync_writes += 1
+        return True if queued else self.write_fn([record])
+
+    def flush(self) -> bool:
+        """Block until every record queued before this call has been written.
+
+        Records queued while waiting are not waited for, so a steady stream of
+        predictions cannot hold a history read back. Returns False if they are
+        still not written after `flush_timeout` seconds.
+        """
+        with self._written_cond:
+            target = self._queued
+            if self._written_cond.wait_for(lambda: self._done >= target, timeout=self.flush_timeout):
+                return True
+            self._flush_timeouts += 1
+            pending = target - self._done
+        print(f"⚠️ History flush timed out after {self.flush_timeout:g} s with {pending} records still queued")
+        return False
+
+    def close(self):
+        """Stop the worker thread once queued records have been written"""
+        with self._lock:
+            stopping = not self._closed
+            self._closed = True
+        if stopping:
+            # Outside the lock: put() may wait for the worker, which needs the lock to finish a batch
+            self._queue.put(None)
+        self._worker.join()
+
+    def stats(self) -> dict:
+        """Queue depth and flush latency, to weigh durability against speed"""
+        with self._lock:
+            return {
+                'flush_rows': self.flush_rows,
+                'flush_interval_ms': self.flush_interval * 1000,
+                'max_queue': self.max_queue,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_depth,
+                'flushes': self._flushes,
+                'rows_written': self._rows_written,
+                'failed_rows': self._failed_rows,
+                'fallback_rows': self._fallback_rows,
+                'sync_writes': self._sync_writes,
+                'flush_timeouts': self._flush_timeouts,
+                'mean_flush_rows': self._rows_written / self._flushes if self._flushes else 0.0,
+                'mean_flush_ms': self._flush_seconds / self._flushes * 1000 if self._flushes else 0.0,
+                'max_flush_ms': self._max_flush_seconds * 1000,
+            }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+
+            start = time.perf_counter()
+            if self._write(self.write_fn, batch):
+                written, failed, fallback = len(batch), 0, 0
+            else:
+                # Retry record by record; only records that fail again are lost
+                written = sum(self._write(self.write_one_fn, record) for record in batch)
+                failed, fallback = len(batch) - written, len(batch)
+                if failed:
+                    print(f"Error writing prediction history: {failed} of {len(batch)} records were not saved")
+            elapsed = time.perf_counter() - start
+
+            with self._written_cond:
+                self._flushes += 1
+                self._rows_written += written
+                self._failed_rows += failed
+                self._fallback_rows += fallback
+                self._flush_seconds += elapsed
+                self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+                self._done += len(batch)
+                self._written_cond.notify_all()
+
+    @staticmethod
+    def _write(fn, records) -> bool:
+        try:
+            return bool(fn(records))
+        except Exception as e:
+            print(f"Error writing prediction history: {e}")
+            return False
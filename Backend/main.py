@@ -1,19 +1,38 @@
-from fastapi import FastAPI, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import os
-import pickle
+import re
 import json
-from datetime import datetime
-import sqlite3
-from database import init_db, add_user, get_user, user_exists, add_prediction, get_user_predictions, delete_prediction, clear_user_history
-import uvicorn
-import pickle
-import numpy as np
-import os
+import hashlib
+import hmac
+import signal
+import threading
+from datetime import datetime, timezone
 from typing import List, Optional
-from datetime import datetime
-from database import init_db, add_user, get_user, user_exists, add_prediction, get_user_predictions, delete_prediction, clear_user_history
+import numpy as np
+from database import init_db, add_user, get_user, user_exists, add_prediction, add_predictions, get_user_predictions, get_user_summary, delete_prediction, clear_user_history, close_connections, user_cache, iter_predictions
+from ensemble import FusedEnsemble, predict_batch, agreement_marker, check_finite, NOT_EVALUATED
+from batching import MicroBatcher
+from history_writer import HistoryWriter
+from fast_json import FastJSONResponse
+from history_export import MEDIA_TYPES, stream_export
+from csv_stream import CSV_STREAM_CHUNK_ROWS, NDJSONStreamingResponse, iter_row_chunks, parse_rows
+from prediction_cache import PredictionCache
+from model_artifact import MANIFEST_NAME, load_artifact, read_manifest
+from model_registry import ModelRegistry, ModelVersion
+import metrics
+from metrics import BATCH_ROWS, MetricsMiddleware
+import profiling
+from profiling import ProfilingMiddleware
+
+# Startup cost breakdown in milliseconds, reported by /ready
+startup_timings = {'imports_ms': (time.perf_counter() - _import_started) * 1000}
 
 app = FastAPI(title="Liver Disease Prediction API", version="1.0")
 
@@ -26,30 +45,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request profiling (PROFILE_TOKEN / PROFILE_SAMPLE_RATE, see profiling.py)
+app.add_middleware(ProfilingMiddleware)
+
+# Request counts and latency per route for GET /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Initialize database
+_started = time.perf_counter()
 init_db()
+startup_timings['db_init_ms'] = (time.perf_counter() - _started) * 1000
+
+# INFERENCE_ENGINES=0 serves the plain sklearn estimators instead of the NumPy engines
+INFERENCE_ENGINES = os.environ.get('INFERENCE_ENGINES', '1') == '1'
 
-# Load the voting ensemble model with KNN, Random Forest, and SVM
-ensemble_model_path = os.path.join(os.path.dirname(__file__), 'voting_ensemble_model.pkl')
-try:
+# Pickle-free artifact written by train_voting_ensemble.py (or python model_artifact.py).
+# When present it is memory-mapped instead of unpickling voting_ensemble_model.pkl,
+# so sklearn is not loaded and worker processes share the model pages
+MODEL_ARTIFACT_DIR = os.environ.get('MODEL_ARTIFACT_DIR', os.path.join(os.path.dirname(__file__), 'model_artifact'))
+
+def artifact_is_current(ensemble_model_path):
+    """False when the artifact was exported from a different voting_ensemble_model.pkl than the one on disk"""
+    source_sha256 = read_manifest(MODEL_ARTIFACT_DIR)['metadata'].get('source_sha256')
+    if source_sha256 is None or not os.path.exists(ensemble_model_path):
+        return True
     with open(ensemble_model_path, 'rb') as f:
-        ensemble_model_data = pickle.load(f)
-        knn_model = ensemble_model_data['knn_pipeline']
-        rf_model = ensemble_model_data['rf_pipeline']
-        svm_model = ensemble_model_data['svm_pipeline']
-        ensemble_accuracy = ensemble_model_data['ensemble_accuracy']
-        print(f"✅ Voting Ensemble Model loaded successfully (Accuracy: {ensemble_accuracy*100:.2f}%)")
-except FileNotFoundError:
-    print("⚠️ Voting ensemble model not found. Using fallback KNN model.")
-    fallback_model_path = os.path.join(os.path.dirname(__file__), 'knn_best_model.pkl')
-    if os.path.exists(fallback_model_path):
-        with open(fallback_model_path, 'rb') as f:
-            knn_model = pickle.load(f)
-        rf_model = None
-        svm_model = None
-        ensemble_accuracy = 0.0
+        return hashlib.sha256(f.read()).hexdigest() == source_sha256
+
+
+def load_model():
+    """Load the ensemble from the model artifact, or from the pickle files.
+
+    Returns a ModelVersion. Unpickling the sklearn models imports sklearn,
+    so this is the slow part of startup.
+    """
+    ensemble_model_path = os.path.join(os.path.dirname(__file__), 'voting_ensemble_model.pkl')
+    use_artifact = INFERENCE_ENGINES and os.path.exists(os.path.join(MODEL_ARTIFACT_DIR, MANIFEST_NAME))
+    if use_artifact and not artifact_is_current(ensemble_model_path):
+        # Retrained since the export: serve the new pickle rather than the stale artifact
+        print(f"⚠️ {os.path.basename(MODEL_ARTIFACT_DIR)}/ was not exported from the current "
+              f"{os.path.basename(ensemble_model_path)}; loading the pickle instead")
+        use_artifact = False
+
+    if use_artifact:
+        manifest, ensemble_model = load_artifact(MODEL_ARTIFACT_DIR)
+        ensemble_accuracy = manifest['metadata'].get('ensemble_accuracy', 0.0)
+        # Identifies the loaded model artifact (cached predictions are tied to it)
+        model_version = manifest['checksum'][:12]
+        source = os.path.basename(MODEL_ARTIFACT_DIR) + '/'
+        print(f"✅ Voting Ensemble Model loaded from {os.path.basename(MODEL_ARTIFACT_DIR)}/ "
+              f"(Accuracy: {ensemble_accuracy*100:.2f}%)")
     else:
-        raise FileNotFoundError("No models found. Please train models first using train_voting_ensemble.py")
+        import pickle
+        
+        # Load the voting ensemble model with KNN, Random Forest, and SVM
+        source = os.path.basename(ensemble_model_path)
+        try:
+            with open(ensemble_model_path, 'rb') as f:
+                model_bytes = f.read()
+                ensemble_model_data = pickle.loads(model_bytes)
+                knn_model = ensemble_model_data['knn_pipeline']
+                rf_model = ensemble_model_data['rf_pipeline']
+                svm_model = ensemble_model_data['svm_pipeline']
+                ensemble_accuracy = ensemble_model_data['ensemble_accuracy']
+                print(f"✅ Voting Ensemble Model loaded successfully (Accuracy: {ensemble_accuracy*100:.2f}%)")
+        except FileNotFoundError:
+            print("⚠️ Voting ensemble model not found. Using fallback KNN model.")
+            fallback_model_path = os.path.join(os.path.dirname(__file__), 'knn_best_model.pkl')
+            source = os.path.basename(fallback_model_path)
+            if os.path.exists(fallback_model_path):
+                with open(fallback_model_path, 'rb') as f:
+                    model_bytes = f.read()
+                    knn_model = pickle.loads(model_bytes)
+                rf_model = None
+                svm_model = None
+                ensemble_accuracy = 0.0
+            else:
+                raise FileNotFoundError("No models found. Please train models first using train_voting_ensemble.py")
+
+        # Identifies the loaded model artifact (cached predictions are tied to it)
+        model_version = hashlib.sha256(model_bytes).hexdigest()[:12]
+
+        # One shared scaler fanned out to the models; the model costs recorded
+        # at training time were measured on the NumPy engines
+        ensemble_model = FusedEnsemble.from_pipelines(knn_model, rf_model, svm_model, engines=INFERENCE_ENGINES)
+        if rf_model is not None and INFERENCE_ENGINES:
+            ensemble_model.model_costs = ensemble_model_data.get('model_costs')
+    return ModelVersion(ensemble_model, model_version, ensemble_accuracy, source)
+
+# Opt-in cost-ordered lazy voting: the two cheapest models vote first and the
+# third only runs when they disagree. Confidence then means agreeing/evaluated
+# models and every result carries an 'agreement' marker such as "2/2" or "2/3"
+LAZY_VOTING = os.environ.get('LAZY_VOTING', '0') == '1'
 
 # Feature names for the liver disease model (matching dataset column order)
 FEATURE_NAMES = [
@@ -65,6 +152,173 @@ FEATURE_NAMES = [
     'Albumin_and_Globulin_Ratio'
 ]
 
+# Optional micro-batching of concurrent single-record predictions (opt-in)
+MICRO_BATCHING = os.environ.get('MICRO_BATCHING', '0') == '1'
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2.0))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+MICRO_BATCH_TIMEOUT_MS = float(os.environ.get('MICRO_BATCH_TIMEOUT_MS', 1000.0))
+
+# Optional write-behind for prediction history (opt-in): rows are queued and
+# inserted in batches by a background thread instead of during the request
+HISTORY_WRITE_BEHIND = os.environ.get('HISTORY_WRITE_BEHIND', '0') == '1'
+HISTORY_FLUSH_ROWS = int(os.environ.get('HISTORY_FLUSH_ROWS', 100))
+HISTORY_FLUSH_MS = float(os.environ.get('HISTORY_FLUSH_MS', 50.0))
+HISTORY_QUEUE_SIZE = int(os.environ.get('HISTORY_QUEUE_SIZE', 10000))
+HISTORY_FLUSH_TIMEOUT = float(os.environ.get('HISTORY_FLUSH_TIMEOUT', 5.0))
+
+micro_batcher = None
+history_writer = None
+
+def score_micro_batch(active, X):
+    BATCH_ROWS.labels('micro_batch').observe(len(X))
+    return predict_batch(active.model, X, lazy=LAZY_VOTING)
+
+def start_background_workers():
+    """Start the opt-in micro-batcher and history writer threads for this process.
+
+    Runs at import, or in each worker after the fork when the pre-fork launcher
+    (serve.py) sets DEFER_BACKGROUND_WORKERS=1, since threads do not survive a fork.
+    """
+    global micro_batcher, history_writer
+    if MICRO_BATCHING and micro_batcher is None:
+        micro_batcher = MicroBatcher(
+            score_micro_batch,
+            max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+            max_batch_size=MICRO_BATCH_MAX_SIZE,
+            timeout_ms=MICRO_BATCH_TIMEOUT_MS
+        )
+        print(f"✅ Micro-batching enabled (max wait {MICRO_BATCH_MAX_WAIT_MS} ms, max batch {MICRO_BATCH_MAX_SIZE})")
+    if HISTORY_WRITE_BEHIND and history_writer is None:
+        history_writer = HistoryWriter(
+            add_predictions,
+            flush_rows=HISTORY_FLUSH_ROWS,
+            flush_interval_ms=HISTORY_FLUSH_MS,
+            max_queue=HISTORY_QUEUE_SIZE,
+            write_one_fn=lambda record: add_prediction(**record),
+            flush_timeout=HISTORY_FLUSH_TIMEOUT
+        )
+        print(f"✅ History write-behind enabled (flush every {HISTORY_FLUSH_ROWS} rows or {HISTORY_FLUSH_MS} ms)")
+
+if os.environ.get('DEFER_BACKGROUND_WORKERS', '0') != '1':
+    start_background_workers()
+
+def flush_history():
+    """Write queued history rows first, so reads and deletes see every earlier prediction"""
+    if history_writer is not None:
+        history_writer.flush()
+
+# LRU cache of single-record results; PREDICTION_CACHE_SIZE=0 disables it
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE)
+
+# LAZY_STARTUP=1 loads the model in a background warm-up thread, so the server
+# answers /, /features and /ready at once; prediction endpoints return 503
+# until /ready reports the model loaded and warmed up
+LAZY_STARTUP = os.environ.get('LAZY_STARTUP', '0') == '1'
+
+model_load_error = None
+
+def load_version():
+    """load_model(), plus the model cost measurement lazy voting needs"""
+    candidate = load_model()
+    model = candidate.model
+    if LAZY_VOTING and model.is_voting:
+        if not getattr(model, 'model_costs', None):
+            # Model files trained before costs were recorded: measure them now
+            model.measure_costs()
+        print(f"✅ Lazy voting enabled (model order: {', '.join(model.cost_order(1))})")
+    return candidate
+
+# Active model version plus the previous one for rollback; POST /models/reload
+# (or SIGHUP) loads the model files again in the background, checks them on a
+# smoke set and swaps them in without blocking requests
+model_registry = ModelRegistry(load_version, lazy=LAZY_VOTING)
+
+# X-Admin-Token for /models/reload, /models/rollback and /export/history; empty disables them
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+
+def admin_token_matches(token):
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin(token):
+    if not admin_token_matches(token):
+        raise HTTPException(status_code=403, detail="Administration is disabled or the token is wrong")
+
+def warm_up():
+    """Load the ensemble, validate it on the smoke set and publish it"""
+    global model_load_error
+    try:
+        started = time.perf_counter()
+        candidate = load_version()
+        startup_timings['model_load_ms'] = (time.perf_counter() - started) * 1000
+        
+        # The first predictions pay one-off costs (lazy tables, first touch of the model pages)
+        started = time.perf_counter()
+        model_registry.validate(candidate)
+        startup_timings['first_inference_ms'] = (time.perf_counter() - started) * 1000
+    except Exception as e:
+        model_load_error = e
+        print(f"⚠️ Model warm-up failed: {e}")
+        if not LAZY_STARTUP:
+            raise
+        return
+    
+    model_registry.activate(candidate)
+    print("✅ Ready: " + ", ".join(f"{name[:-3].replace('_', ' ')} {ms:.0f} ms" for name, ms in startup_timings.items()))
+
+def current_model():
+    """The active ModelVersion, read once so a request uses one model throughout; 503 while loading"""
+    active = model_registry.active
+    if active is None:
+        if model_load_error is not None:
+            raise HTTPException(status_code=503, detail=f"Model failed to load: {model_load_error}")
+        raise HTTPException(status_code=503, detail="Model is loading, retry shortly", headers={'Retry-After': '1'})
+    return active
+
+def install_signal_handlers():
+    """kill -HUP reloads the model files in the background, kill -USR2 rolls back"""
+    signal.signal(signal.SIGHUP, lambda signum, frame: model_registry.reload())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: model_registry.rollback())
+
+if LAZY_STARTUP:
+    threading.Thread(target=warm_up, name='model-warm-up', daemon=True).start()
+else:
+    warm_up()
+
+# Signal handlers can only be installed from the main thread (not under e.g. a TestClient thread)
+if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+    install_signal_handlers()
+
+def score_record(request, active):
+    """Score one record with the ModelVersion `active`, returning (prediction, confidence, votes or None)"""
+    # Extract features in the correct order (matching dataset)
+    with profiling.stage('feature_extraction'):
+        features = tuple(getattr(request, name) for name in FEATURE_NAMES)
+    # Before the micro-batcher, where one bad row would fail its whole batch
+    check_finite(features)
+    
+    cached = prediction_cache.get(features, active.version)
+    if cached is not None:
+        return cached
+    
+    batched = None
+    if micro_batcher is not None:
+        # Scored with `active` even if another version is swapped in meanwhile,
+        # so the result matches the version it is cached and labelled under
+        try:
+            batched = micro_batcher.submit(features, active)
+        except TimeoutError as e:
+            print(f"⚠️ {e}; scoring the record on its own")
+    if batched is not None:
+        prediction, confidence, votes = batched
+    else:
+        predictions, confidences, votes = predict_batch(active.model, np.array(features).reshape(1, -1), lazy=LAZY_VOTING)
+        prediction, confidence, votes = predictions[0], confidences[0], None if votes is None else votes[0]
+    
+    result = (int(prediction), float(confidence), None if votes is None else tuple(int(v) for v in votes))
+    prediction_cache.put(features, active.version, result)
+    return result
+
 # Pydantic models for request/response
 class PredictionRequest(BaseModel):
     Age: float
@@ -82,6 +336,7 @@ class PredictionResponse(BaseModel):
     prediction: int
     status: str
     confidence: Optional[float] = None
+    agreement: Optional[str] = None
 
 class BatchPredictionRequest(BaseModel):
     records: List[PredictionRequest]
@@ -121,6 +376,38 @@ class HistoryResponse(BaseModel):
     username: str
     records: List[dict]
     total_predictions: int
+    next_before_id: Optional[int] = None
+
+class HistorySummaryResponse(BaseModel):
+    username: str
+    total_predictions: int
+    positive_predictions: int
+    positive_rate: Optional[float] = None
+    mean_confidence: Optional[float] = None
+    first_prediction_at: Optional[str] = None
+    last_prediction_at: Optional[str] = None
+    mean_medical_parameters: dict
+
+# prediction_summary sums (database.SUMMARY_VALUES) by the feature they average
+SUMMARY_FEATURES = {
+    'age': 'Age',
+    'tb': 'Total_Bilirubin',
+    'db': 'Direct_Bilirubin',
+    'alkphos': 'Alkaline_Phosphotase',
+    'sgpt': 'Alamine_Aminotransferase',
+    'sgot': 'Aspartate_Aminotransferase',
+    'tp': 'Total_Proteins',
+    'alb': 'Albumin',
+    'ag_ratio': 'Albumin_and_Globulin_Ratio'
+}
+
+@app.on_event("shutdown")
+def shutdown():
+    if micro_batcher is not None:
+        micro_batcher.close()
+    if history_writer is not None:
+        history_writer.close()
+    close_connections()
 
 @app.get("/")
 def home():
@@ -131,9 +418,14 @@ def home():
             'predict': '/predict (POST)',
             'batch-predict': '/batch-predict (POST)',
             'features': '/features (GET)',
+            'ready': '/ready (GET)',
+            'models': '/models (GET)',
+            'metrics': '/metrics (GET)',
             'signup': '/signup (POST)',
             'login': '/login (POST)',
             'history': '/history/<username> (GET)',
+            'history-summary': '/history/<username>/summary (GET)',
+            'history-export': '/history/<username>/export (GET)',
             'docs': '/docs'
         }
     }
@@ -141,11 +433,12 @@ def home():
 # Authentication Endpoints
 @app.post("/signup", response_model=SignUpResponse)
 def signup(request: SignUpRequest):
-    if user_exists(request.username):
-        raise HTTPException(status_code=400, detail="Username already exists")
-    
+    # Insert first; only a rejected insert needs the lookup to pick the error message
     if add_user(request.username, request.password, request.email, request.full_name):
         return SignUpResponse(message="Account created successfully", username=request.username)
+    
+    if user_exists(request.username):
+        raise HTTPException(status_code=400, detail="Username already exists")
     else:
         raise HTTPException(status_code=400, detail="Email already exists")
 
@@ -165,33 +458,135 @@ def login(request: LoginRequest):
         user_id=str(user['id'])
     )
 
+# /batch-predict and /history send the body they build as is (FastJSONResponse);
+# FAST_RESPONSES=0 passes it through their response_model validation again
+FAST_RESPONSES = os.environ.get('FAST_RESPONSES', '1') == '1'
+
+# Largest page /history returns when a limit is given
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get('HISTORY_MAX_PAGE_SIZE', 1000))
+
 @app.get("/history/{username}", response_model=HistoryResponse)
-def get_history(username: str):
+@profiling.profiled
+def get_history(username: str,
+                limit: Optional[int] = Query(None, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+                before_id: Optional[int] = None):
     user = get_user(username)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    predictions = get_user_predictions(user['id'])
+    flush_history()
+    
+    # Fetch one extra row to know whether another page follows
+    predictions = get_user_predictions(user['id'], limit=None if limit is None else limit + 1, before_id=before_id)
+    
+    next_before_id = None
+    if limit is not None and len(predictions) > limit:
+        predictions = predictions[:limit]
+        next_before_id = predictions[-1]['id']
+    
+    if FAST_RESPONSES:
+        # The rows already have the record layout of HistoryResponse
+        with profiling.stage('serialize'):
+            return FastJSONResponse({
+                'username': username,
+                'records': predictions,
+                'total_predictions': len(predictions),
+                'next_before_id': next_before_id
+            })
     
     # Format for response
-    records = []
-    for pred in predictions:
-        records.append({
-            'id': pred['id'],
-            'medical_parameters': pred['medical_parameters'],
-            'prediction': pred['prediction'],
-            'status': pred['status'],
-            'confidence': pred['confidence'],
-            'timestamp': pred['timestamp']
-        })
+    with profiling.stage('format_records'):
+        records = []
+        for pred in predictions:
+            records.append({
+                'id': pred['id'],
+                'medical_parameters': pred['medical_parameters'],
+                'prediction': pred['prediction'],
+                'status': pred['status'],
+                'confidence': pred['confidence'],
+                'timestamp': pred['timestamp']
+            })
     
     return HistoryResponse(
         username=username,
         records=records,
-        total_predictions=len(records)
+        total_predictions=len(records),
+        next_before_id=next_before_id
+    )
+
+@app.get("/history/{username}/summary", response_model=HistorySummaryResponse)
+def get_history_summary(username: str):
+    """Totals, positive rate and mean values of a user's history, read from one summary row"""
+    user = get_user(username)
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    flush_history()
+    
+    summary = get_user_summary(user['id'])
+    if summary is None:
+        return HistorySummaryResponse(username=username, total_predictions=0, positive_predictions=0,
+                                      mean_medical_parameters={})
+    
+    total = summary['total']
+    return HistorySummaryResponse(
+        username=username,
+        total_predictions=total,
+        positive_predictions=int(summary['positive']),
+        positive_rate=summary['positive'] / total,
+        mean_confidence=summary['confidence_sum'] / total,
+        first_prediction_at=summary['first_at'],
+        last_prediction_at=summary['last_at'],
+        mean_medical_parameters={name: summary[f'{column}_sum'] / total for column, name in SUMMARY_FEATURES.items()}
     )
 
+def export_bound(moment: Optional[datetime]) -> Optional[str]:
+    """A start/end query value as a created_at string (UTC, as SQLite's CURRENT_TIMESTAMP writes it)"""
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat(sep=' ')
+
+def export_response(chunks, export_format, name):
+    """Stream the row chunks as a CSV or NDJSON download"""
+    filename = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+    return StreamingResponse(
+        stream_export(chunks, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+@app.get("/history/{username}/export")
+def export_history(username: str,
+                   export_format: str = Query('csv', alias='format', pattern='^(csv|ndjson)$'),
+                   start: Optional[datetime] = None,
+                   end: Optional[datetime] = None):
+    """Stream a user's predictions, oldest first, optionally from `start` and before `end`"""
+    user = get_user(username)
+    
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    flush_history()
+    
+    chunks = iter_predictions(user['id'], export_bound(start), export_bound(end))
+    return export_response(chunks, export_format, f'history-{username}')
+
+@app.get("/export/history")
+def export_all_history(export_format: str = Query('csv', alias='format', pattern='^(csv|ndjson)$'),
+                       start: Optional[datetime] = None,
+                       end: Optional[datetime] = None,
+                       x_admin_token: Optional[str] = Header(None)):
+    """Stream every user's predictions for audits; needs the X-Admin-Token header"""
+    require_admin(x_admin_token)
+    flush_history()
+    
+    chunks = iter_predictions(None, export_bound(start), export_bound(end))
+    return export_response(chunks, export_format, 'history')
+
 @app.delete("/history/{username}/{prediction_id}")
 def delete_single_prediction(username: str, prediction_id: int):
     user = get_user(username)
@@ -199,6 +594,8 @@ def delete_single_prediction(username: str, prediction_id: int):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    flush_history()
+    
     if delete_prediction(prediction_id, user['id']):
         return {'message': 'Prediction deleted successfully'}
     else:
@@ -211,6 +608,8 @@ def clear_history(username: str):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    flush_history()
+    
     if clear_user_history(user['id']):
         return {'message': 'History cleared successfully'}
     else:
@@ -220,63 +619,97 @@ def clear_history(username: str):
 def get_features():
     return {
         'features': FEATURE_NAMES,
-        'total_features': len(FEATURE_NAMES)
+        'total_features': len(FEATURE_NAMES),
+        'model_version': None if model_registry.active is None else model_registry.active.version
     }
 
-@app.post("/predict", response_model=PredictionResponse)
-def predict(request: PredictionRequest):
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before"""
+    active = model_registry.active
+    return JSONResponse(
+        status_code=200 if active is not None else 503,
+        content={
+            'ready': active is not None,
+            'model_version': None if active is None else active.version,
+            'startup_ms': {name: round(ms, 1) for name, ms in startup_timings.items()},
+            'error': None if model_load_error is None else str(model_load_error)
+        }
+    )
+
+@app.get("/stats")
+def get_stats():
+    return {
+        'micro_batching': {'enabled': True, **micro_batcher.stats()} if micro_batcher is not None else {'enabled': False},
+        'prediction_cache': prediction_cache.stats(),
+        'models': model_registry.status(),
+        'user_cache': user_cache.stats(),
+        'history_writer': {'enabled': True, **history_writer.stats()} if history_writer is not None else {'enabled': False}
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format: requests, model inference, votes, batch sizes and database calls"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile: Optional[str] = Header(None)):
+    """A stored profiling report; needs the X-Profile header with PROFILE_TOKEN"""
+    if not profiling.token_matches(x_profile):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the token is wrong")
+    report = profiling.load_report(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
+
+@app.get("/models")
+def get_models():
+    """Active and previous model versions and the outcome of the last reload"""
+    return model_registry.status()
+
+@app.post("/models/reload")
+def reload_model(wait: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """Load the model files again in the background and swap them in once they pass the smoke set"""
+    require_admin(x_admin_token)
+    started = model_registry.reload(wait=wait)
+    return JSONResponse(status_code=200 if wait else 202, content={'started': started, **model_registry.status()})
+
+@app.post("/models/rollback")
+def rollback_model(x_admin_token: Optional[str] = Header(None)):
+    """Swap back to the previous model version"""
+    require_admin(x_admin_token)
+    if model_registry.rollback() is None:
+        raise HTTPException(status_code=409, detail="No previous model version to roll back to")
+    return model_registry.status()
+
+@app.post("/predict", response_model=PredictionResponse, response_model_exclude_unset=True)
+@profiling.profiled
+def predict(request: PredictionRequest, response: Response):
+    active = current_model()
+    response.headers['X-Model-Version'] = active.version
     try:
-        # Extract features in the correct order
-        features = [
-            request.Age,
-            request.Gender,
-            request.Total_Bilirubin,
-            request.Direct_Bilirubin,
-            request.Alkaline_Phosphotase,
-            request.Alamine_Aminotransferase,
-            request.Aspartate_Aminotransferase,
-            request.Total_Proteins,
-            request.Albumin,
-            request.Albumin_and_Globulin_Ratio
-        ]
+        prediction, confidence, votes = score_record(request, active)
         
-        # Convert to numpy array and reshape for prediction
-        input_data = np.array(features).reshape(1, -1)
-        
-        if rf_model is not None and svm_model is not None:
-            # Use voting ensemble (KNN + Random Forest + SVM)
-            knn_pred = knn_model.predict(input_data)[0]
-            rf_pred = rf_model.predict(input_data)[0]
-            svm_pred = svm_model.predict(input_data)[0]
-            
-            # Majority voting: if at least 2 algorithms predict 1, result is 1
-            votes = [knn_pred, rf_pred, svm_pred]
-            prediction = 1 if sum(votes) >= 2 else 0
-            
-            # Calculate confidence as percentage of models agreeing
-            agreement_count = sum([knn_pred == prediction, rf_pred == prediction, svm_pred == prediction])
-            confidence = (agreement_count / 3) * 100
-            
+        if votes is not None:
+            # Voting ensemble (KNN + Random Forest + SVM), confidence = % of models agreeing
+            knn_pred, rf_pred, svm_pred = [None if vote == NOT_EVALUATED else int(vote) for vote in votes]
             result = {
                 'prediction': int(prediction),
                 'status': 'Liver Disease Detected' if prediction == 1 else 'No Liver Disease',
-                'confidence': confidence,
+                'confidence': float(confidence),
                 'algorithm': 'Voting Ensemble (KNN + RF + SVM)',
-                'votes': {'knn': int(knn_pred), 'random_forest': int(rf_pred), 'svm': int(svm_pred)}
+                'votes': {'knn': knn_pred, 'random_forest': rf_pred, 'svm': svm_pred}
             }
+            if LAZY_VOTING:
+                result['agreement'] = agreement_marker(votes, prediction)
         else:
             # Fallback to KNN only
-            prediction = knn_model.predict(input_data)[0]
-            probability = knn_model.predict_proba(input_data)[0] if hasattr(knn_model, 'predict_proba') else None
-            
             result = {
                 'prediction': int(prediction),
                 'status': 'Liver Disease Detected' if prediction == 1 else 'No Liver Disease',
+                'confidence': float(confidence) if hasattr(active.model.knn, 'predict_proba') else None,
                 'algorithm': 'KNN (Fallback)'
             }
-            
-            if probability is not None:
-                result['confidence'] = float(max(probability)) * 100
         
         return result
     
@@ -284,57 +717,28 @@ def predict(request: PredictionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/predict/{username}")
-def predict_with_history(username: str, request: PredictionRequest):
+@profiling.profiled
+def predict_with_history(username: str, request: PredictionRequest, response: Response):
+    active = current_model()
+    response.headers['X-Model-Version'] = active.version
     try:
         user = get_user(username)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Extract features in the correct order (matching dataset)
-        features = [
-            request.Age,
-            request.Gender,
-            request.Total_Bilirubin,
-            request.Direct_Bilirubin,
-            request.Alkaline_Phosphotase,
-            request.Alamine_Aminotransferase,
-            request.Aspartate_Aminotransferase,
-            request.Total_Proteins,
-            request.Albumin,
-            request.Albumin_and_Globulin_Ratio
-        ]
-        
-        # Convert to numpy array and reshape for prediction
-        input_data = np.array(features).reshape(1, -1)
-        
-        if rf_model is not None and svm_model is not None:
-            # Use voting ensemble (KNN + Random Forest + SVM)
-            knn_pred = knn_model.predict(input_data)[0]
-            rf_pred = rf_model.predict(input_data)[0]
-            svm_pred = svm_model.predict(input_data)[0]
-            
-            # Majority voting: if at least 2 algorithms predict 1, result is 1
-            votes = [knn_pred, rf_pred, svm_pred]
-            prediction = 1 if sum(votes) >= 2 else 0
-            
-            # Calculate confidence as percentage of models agreeing
-            agreement_count = sum([knn_pred == prediction, rf_pred == prediction, svm_pred == prediction])
-            confidence = (agreement_count / 3) * 100
-        else:
-            # Fallback to KNN only
-            prediction = knn_model.predict(input_data)[0]
-            probability = knn_model.predict_proba(input_data)[0] if hasattr(knn_model, 'predict_proba') else None
-            confidence = float(max(probability)) * 100 if probability is not None else 0.0
+        prediction, confidence, votes = score_record(request, active)
         
         result = {
             'prediction': int(prediction),
             'status': 'Liver Disease Detected' if prediction == 1 else 'No Liver Disease',
-            'confidence': confidence,
+            'confidence': float(confidence),
         }
+        if LAZY_VOTING and votes is not None:
+            result['agreement'] = agreement_marker(votes, prediction)
         
-        # Add to database history
-        add_prediction(
+        # Add to database history (queued for the background writer in write-behind mode)
+        record = dict(
             user_id=user['id'],
             age=request.Age,
             gender='Male' if request.Gender == 1 else 'Female',
@@ -350,6 +754,10 @@ def predict_with_history(username: str, request: PredictionRequest):
             status=result['status'],
             confidence=result['confidence']
         )
+        if history_writer is not None:
+            history_writer.add(record)
+        else:
+            add_prediction(**record)
         
         return result
     
@@ -358,63 +766,83 @@ def predict_with_history(username: str, request: PredictionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def batch_results(model, input_data, indices):
+    """Score an N x 10 matrix with `model` and return one result dict per row, labelled with `indices`"""
+    predictions, confidences, votes = predict_batch(model, input_data, lazy=LAZY_VOTING)
+    
+    results = [
+        {
+            'index': idx,
+            'prediction': int(prediction),
+            'status': 'Liver Disease Detected' if prediction == 1 else 'No Liver Disease',
+            'confidence': float(confidence)
+        }
+        for idx, prediction, confidence in zip(indices, predictions, confidences)
+    ]
+    if LAZY_VOTING and votes is not None:
+        for result, row_votes in zip(results, votes):
+            result['agreement'] = agreement_marker(row_votes, result['prediction'])
+    return results
+
 @app.post("/batch-predict", response_model=BatchPredictionResponse)
-def batch_predict(request: BatchPredictionRequest):
+@profiling.profiled
+def batch_predict(request: BatchPredictionRequest, response: Response):
+    active = current_model()
+    response.headers['X-Model-Version'] = active.version
     try:
-        results = []
-        
-        for idx, record in enumerate(request.records):
-            features = [
-                record.Age,
-                record.Gender,
-                record.Total_Bilirubin,
-                record.Direct_Bilirubin,
-                record.Alkaline_Phosphotase,
-                record.Alamine_Aminotransferase,
-                record.Aspartate_Aminotransferase,
-                record.Total_Proteins,
-                record.Albumin,
-                record.Albumin_and_Globulin_Ratio
-            ]
-            
-            input_data = np.array(features).reshape(1, -1)
-            
-            if rf_model is not None and svm_model is not None:
-                # Use voting ensemble (KNN + Random Forest + SVM)
-                knn_pred = knn_model.predict(input_data)[0]
-                rf_pred = rf_model.predict(input_data)[0]
-                svm_pred = svm_model.predict(input_data)[0]
-                
-                # Majority voting: if at least 2 algorithms predict 1, result is 1
-                votes = [knn_pred, rf_pred, svm_pred]
-                prediction = 1 if sum(votes) >= 2 else 0
-                
-                # Calculate confidence
-                agreement_count = sum([knn_pred == prediction, rf_pred == prediction, svm_pred == prediction])
-                confidence = (agreement_count / 3) * 100
-            else:
-                # Fallback to KNN only
-                prediction = knn_model.predict(input_data)[0]
-                probability = knn_model.predict_proba(input_data)[0] if hasattr(knn_model, 'predict_proba') else None
-                confidence = float(max(probability)) * 100 if probability is not None else 0.0
-            
-            result = {
-                'index': idx,
-                'prediction': int(prediction),
-                'status': 'Liver Disease Detected' if prediction == 1 else 'No Liver Disease',
-                'confidence': confidence
-            }
-            
-            results.append(result)
+        if not request.records:
+            results = []
+        else:
+            # Build one N x 10 matrix in FEATURE_NAMES order and score it in chunks
+            with profiling.stage('feature_extraction'):
+                input_data = np.array([[getattr(record, name) for name in FEATURE_NAMES] for record in request.records])
+            BATCH_ROWS.labels('batch_predict').observe(len(input_data))
+            results = batch_results(active.model, input_data, range(len(input_data)))
         
-        return {
+        content = {
             'total_records': len(results),
             'results': results
         }
+        if FAST_RESPONSES:
+            # A returned Response does not pick up headers set on `response`
+            with profiling.stage('serialize'):
+                return FastJSONResponse(content, headers={'X-Model-Version': active.version})
+        return content
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def score_csv_rows(model, rows):
+    """Score one chunk of parsed CSV rows with `model` and return its NDJSON lines, in row order"""
+    input_data, indices, errors = parse_rows(rows)
+    lines = [{'index': idx, 'error': message} for idx, message in errors]
+    if indices:
+        BATCH_ROWS.labels('csv').observe(len(indices))
+        lines += batch_results(model, input_data, indices)
+    lines.sort(key=lambda line: line['index'])
+    return ''.join(json.dumps(line) + '\n' for line in lines).encode(), len(indices), len(errors)
+
+@app.post("/batch-predict/csv")
+async def batch_predict_csv(request: Request):
+    """Score an ILPD-layout CSV body chunk by chunk, streaming one NDJSON line per row"""
+    # Every chunk uses the version active when the upload started, even across a swap
+    active = current_model()
+    
+    async def stream():
+        total = failed = 0
+        try:
+            async for rows in iter_row_chunks(request.stream(), CSV_STREAM_CHUNK_ROWS):
+                body, scored, errors = await run_in_threadpool(score_csv_rows, active.model, rows)
+                total += scored + errors
+                failed += errors
+                yield body
+        except ValueError as e:
+            # Results already sent cannot be retracted; end the stream with the error
+            yield (json.dumps({'error': str(e)}) + '\n').encode()
+        yield (json.dumps({'total_records': total, 'failed_records': failed}) + '\n').encode()
+    
+    return NDJSONStreamingResponse(stream(), headers={'X-Model-Version': active.version})
+
 if __name__ == '__main__':
     import uvicorn
     uvicorn.run(app, host='0.0.0.0', port=5000)
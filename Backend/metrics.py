@@ -0,0 +1,247 @@
+"""
+Prometheus-format metrics for the prediction API
+Counters and histograms keep one shard of values per thread: a thread only
+ever writes its own shard, so recording takes no lock, and a scrape of
+/metrics sums the shards. Each worker process exposes its own numbers.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request and database latency (seconds)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# A single model on one chunk of rows (seconds)
+INFERENCE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Rows per batch
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class _Shards:
+    """Per-thread lists of `size` numbers; only the owning thread writes to a list"""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def mine(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = [0] * self.size
+            # Only the first use in each thread takes the lock
+            with self._lock:
+                self._all.append(values)
+        return values
+
+    def totals(self):
+        with self._lock:
+            shards = list(self._all)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self.size
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.mine()[0] += amount
+
+    def value(self):
+        return self._shards.totals()[0]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket, the +Inf count, then the sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        values = self._shards.mine()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        """(cumulative bucket counts including +Inf, count, sum)"""
+        totals = self._shards.totals()
+        cumulative = []
+        running = 0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, totals[-1]
+
+
+class _Timer:
+    """Context manager that observes the elapsed seconds"""
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        """The child for these label values, created on first use"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            children = sorted(self._children.items())
+        for values, child in children:
+            lines += self._render_child(values, child)
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{self._label_text(values)} {_number(child.value())}']
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        cumulative, count, total = child.snapshot()
+        bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+        lines = [f'{self.name}_bucket{self._label_text(values, [("le", bound)])} {bucket_count}'
+                 for bound, bucket_count in zip(bounds, cumulative)]
+        lines.append(f'{self.name}_sum{self._label_text(values)} {_number(total)}')
+        lines.append(f'{self.name}_count{self._label_text(values)} {count}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = []
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+
+# Metrics shared by main.py, ensemble.py and database.py
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route and status code',
+                        ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency until the response is sent',
+                         ('method', 'route'))
+HTTP_ERRORS = Counter('http_request_errors_total', 'Requests that raised an unhandled exception',
+                      ('method', 'route'))
+MODEL_INFERENCE = Histogram('model_inference_seconds', 'Time one model spends predicting one chunk of rows',
+                            ('model',), buckets=INFERENCE_BUCKETS)
+VOTE_AGREEMENT = Counter('vote_agreement_total', 'Scored rows by agreeing/evaluated models, e.g. 3/3 or 2/3',
+                         ('agreement',))
+BATCH_ROWS = Histogram('prediction_batch_rows', 'Rows scored together, by source', ('source',),
+                       buckets=SIZE_BUCKETS)
+DB_LATENCY = Histogram('db_call_duration_seconds', 'Latency of database.py functions', ('function',))
+DB_ERRORS = Counter('db_call_errors_total', 'database.py calls that raised or reported failure',
+                    ('function',))
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting and timing every request by its route template.
+
+    A plain ASGI wrapper rather than BaseHTTPMiddleware, so streamed responses
+    (and request bodies still being read) pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        method = scope['method']
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            HTTP_ERRORS.labels(method, _route(scope)).inc()
+            raise
+        finally:
+            # The router records the matched route in the scope; unmatched paths share one label
+            route = _route(scope)
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+
+
+def _route(scope):
+    route = scope.get('route')
+    return getattr(route, 'path', None) or '<unmatched>'
@@ -0,0 +1,206 @@
+"""
+Pickle-free model artifact for the fused voting ensemble
+A directory with manifest.json and one raw .npy file per array; loading
+memory-maps the arrays, so worker processes share their pages through the
+OS page cache and serving does not need sklearn
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+import numpy as np
+from engines import KNNEngine, RandomForestEngine, SVMEngine
+from ensemble import FusedEnsemble
+
+ARTIFACT_FORMAT = 'liver-voting-ensemble'
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+class ArtifactError(ValueError):
+    """The artifact is missing, from an unsupported format version, or fails its checksum"""
+
+
+class ScalerParams:
+    """RobustScaler parameters, all FusedEnsemble.transform needs"""
+
+    def __init__(self, center, scale, with_centering=True, with_scaling=True):
+        self.center_ = center
+        self.scale_ = scale
+        self.with_centering = with_centering
+        self.with_scaling = with_scaling
+
+
+def _sha256(array):
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def _checksum(arrays_manifest):
+    digest = hashlib.sha256()
+    for name in sorted(arrays_manifest):
+        digest.update(f"{name}:{arrays_manifest[name]['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+def _replace_file(path, write):
+    """Write a new file and rename it over `path`, so a server still memory-mapping the old one keeps it intact"""
+    with open(path + '.tmp', 'wb') as f:
+        write(f)
+    os.replace(path + '.tmp', path)
+
+
+def export_artifact(ensemble, directory, metadata=None):
+    """Write a FusedEnsemble of NumPy engines to `directory` and return the manifest"""
+    if not ensemble.is_voting:
+        raise ArtifactError("Only the full voting ensemble (KNN + RF + SVM) can be exported")
+    knn, rf, svm = ensemble.knn, ensemble.rf, ensemble.svm
+    if not (isinstance(knn, KNNEngine) and isinstance(rf, RandomForestEngine) and isinstance(svm, SVMEngine)):
+        raise ArtifactError("Build the ensemble with engines=True before exporting it")
+
+    arrays = {
+        'scaler_center': ensemble.scaler.center_,
+        'scaler_scale': ensemble.scaler.scale_,
+        'knn_fit_X': knn.fit_X,
+        'knn_y': knn.y_train,
+        'knn_classes': knn.classes_,
+        'rf_feature': rf.feature,
+        'rf_threshold': rf.threshold,
+        'rf_children_left': rf.children_left,
+        'rf_children_right': rf.children_right,
+        'rf_value': rf.value,
+        'rf_roots': rf.roots,
+        'rf_classes': rf.classes_,
+        'svm_support_vectors': svm.support_vectors,
+        'svm_dual_coef': svm.dual_coef,
+        'svm_classes': svm.classes_,
+    }
+    if rf.missing_go_to_left is not None:
+        arrays['rf_missing_go_to_left'] = rf.missing_go_to_left
+
+    os.makedirs(directory, exist_ok=True)
+    arrays_manifest = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            raise ArtifactError(f"{name} has dtype object and cannot be stored without pickle")
+        _replace_file(os.path.join(directory, f'{name}.npy'), lambda f: np.save(f, array, allow_pickle=False))
+        arrays_manifest[name] = {
+            'file': f'{name}.npy', 'dtype': array.dtype.str, 'shape': list(array.shape), 'sha256': _sha256(array)
+        }
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'metadata': metadata or {},
+        'scaler': {'with_centering': bool(ensemble.scaler.with_centering),
+                   'with_scaling': bool(ensemble.scaler.with_scaling)},
+        'knn': {'n_neighbors': knn.n_neighbors},
+        'rf': {'max_depth': rf.max_depth},
+        'svm': {'kernel': svm.kernel, 'gamma': None if svm.gamma is None else float(svm.gamma), 'intercept': svm.intercept,
+                'prob_a': None if svm.prob_a is None else float(svm.prob_a),
+                'prob_b': None if svm.prob_b is None else float(svm.prob_b)},
+        'model_costs': getattr(ensemble, 'model_costs', None),
+        'arrays': arrays_manifest,
+        'checksum': _checksum(arrays_manifest),
+    }
+    # Manifest last: a directory without one is an incomplete export
+    _replace_file(os.path.join(directory, MANIFEST_NAME), lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    return manifest
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ArtifactError(f"No {MANIFEST_NAME} in {directory}")
+    if manifest.get('format') != ARTIFACT_FORMAT or manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format {manifest.get('format')} "
+                            f"version {manifest.get('format_version')}")
+    return manifest
+
+
+def load_artifact(directory, mmap=True, verify=True):
+    """Load (manifest, FusedEnsemble) from an artifact directory.
+
+    With mmap=True the arrays are memory-mapped read-only instead of copied
+    into the process. verify=True checks every array against its sha256.
+    """
+    manifest = read_manifest(directory)
+    if _checksum(manifest['arrays']) != manifest['checksum']:
+        raise ArtifactError("Manifest checksum mismatch")
+
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        array = np.load(os.path.join(directory, entry['file']), mmap_mode='r' if mmap else None, allow_pickle=False)
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ArtifactError(f"{entry['file']} does not match the manifest")
+        if verify and _sha256(array) != entry['sha256']:
+            raise ArtifactError(f"{entry['file']} fails its checksum")
+        arrays[name] = array
+
+    scaler = ScalerParams(arrays['scaler_center'], arrays['scaler_scale'], **manifest['scaler'])
+    knn = KNNEngine(arrays['knn_fit_X'], arrays['knn_y'], arrays['knn_classes'], manifest['knn']['n_neighbors'])
+    rf = RandomForestEngine(
+        arrays['rf_feature'], arrays['rf_threshold'], arrays['rf_children_left'], arrays['rf_children_right'],
+        arrays['rf_value'], arrays['rf_roots'], arrays['rf_classes'], manifest['rf']['max_depth'],
+        missing_go_to_left=arrays.get('rf_missing_go_to_left')
+    )
+    svm_params = manifest['svm']
+    svm = SVMEngine(
+        svm_params['kernel'], arrays['svm_support_vectors'], arrays['svm_dual_coef'], svm_params['intercept'],
+        arrays['svm_classes'], gamma=svm_params['gamma'], prob_a=svm_params['prob_a'], prob_b=svm_params['prob_b']
+    )
+    return manifest, FusedEnsemble(scaler, knn, rf, svm, model_costs=manifest.get('model_costs'))
+
+
+def check_equivalence(ensemble, reference, X):
+    """Raise ArtifactError unless `ensemble` votes exactly like `reference` on the raw rows X"""
+    for name, ours, theirs in zip(('KNN', 'Random Forest', 'SVM'),
+                                  ensemble.predict_votes(X), reference.predict_votes(X)):
+        mismatches = int((np.asarray(ours) != np.asarray(theirs)).sum())
+        if mismatches:
+            raise ArtifactError(f"{name} predictions differ from the pickled model on {mismatches} of {len(X)} rows")
+
+
+def export_from_pickle(pickle_path, directory, X_check):
+    """Export the model in a voting_ensemble_model.pkl and verify it against the pickle.
+
+    X_check holds raw feature rows; the reloaded (memory-mapped) artifact must
+    give the same KNN, RF and SVM predictions as the pickled sklearn pipelines
+    on all of them, or ArtifactError is raised.
+    """
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        model_bytes = f.read()
+    model_data = pickle.loads(model_bytes)
+    pipelines = model_data['knn_pipeline'], model_data['rf_pipeline'], model_data['svm_pipeline']
+    ensemble = FusedEnsemble.from_pipelines(*pipelines, engines=True)
+    ensemble.model_costs = model_data.get('model_costs')
+
+    metadata = {key: float(value) for key, value in model_data.items()
+                if key.endswith(('_accuracy', '_precision', '_recall', '_f1'))}
+    metadata['source_sha256'] = hashlib.sha256(model_bytes).hexdigest()
+    export_artifact(ensemble, directory, metadata)
+
+    manifest, loaded = load_artifact(directory)
+    check_equivalence(loaded, FusedEnsemble.from_pipelines(*pipelines), X_check)
+    return manifest
+
+
+if __name__ == "__main__":
+    # Export voting_ensemble_model.pkl as model_artifact/ (run from the Backend folder)
+    import warnings
+    import pandas as pd
+    warnings.filterwarnings('ignore')
+    df = pd.read_csv('Indian Liver Patient Dataset (ILPD).csv').dropna()
+    df['Gender'] = df['Gender'].apply(lambda x: 1 if x.upper() in ['M', 'MALE'] else 0)
+    X = df.drop(columns='is_patient').values.astype(float)
+    # Dataset rows plus perturbed copies, so the check also covers unseen inputs
+    rng = np.random.default_rng(0)
+    X_check = np.vstack([X] + [X * rng.uniform(0.5, 1.5, X.shape) for _ in range(20)])
+    manifest = export_from_pickle('voting_ensemble_model.pkl', 'model_artifact', X_check)
+    print(f"✅ Exported model_artifact/ (checksum {manifest['checksum'][:12]}); "
+          f"predictions match the pickle on {len(X_check)} rows")
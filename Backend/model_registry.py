@@ -0,0 +1,153 @@
+"""
+Versioned model registry with background reload, smoke validation and rollback
+Requests read `registry.active` once and use that version throughout, so a
+swap (a single reference assignment) never mixes two models in one request
+and never waits for a load in progress.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from ensemble import predict_batch
+
+# Smoke set: synthetic lab panels spanning the ILPD value ranges (FEATURE_NAMES order)
+SMOKE_ROWS = 64
+SMOKE_RANGES = [(4, 90), (0, 1), (0.4, 75), (0.1, 19.7), (63, 2110), (10, 2000), (10, 4929),
+                (2.7, 9.6), (0.9, 5.5), (0.3, 2.8)]
+
+
+def smoke_inputs(n_rows=SMOKE_ROWS, seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(low, high, n_rows) for low, high in SMOKE_RANGES])
+    X[:, 1] = np.round(X[:, 1])
+    return X
+
+
+class ModelValidationError(ValueError):
+    """A loaded model failed its smoke predictions"""
+
+
+class ModelVersion:
+    """One loaded ensemble and where it came from"""
+
+    def __init__(self, model, version, accuracy, source):
+        self.model = model
+        self.version = version
+        self.accuracy = accuracy
+        self.source = source
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.smoke_predictions = None
+
+    def describe(self) -> dict:
+        return {
+            'version': self.version,
+            'accuracy': self.accuracy,
+            'source': self.source,
+            'loaded_at': self.loaded_at,
+        }
+
+
+class ModelRegistry:
+    """Holds the active model version and the previous one for rollback.
+
+    `load_fn` returns a new ModelVersion from the model files on disk. reload()
+    runs it in a background thread, validates the result on the smoke set
+    and only then swaps it in; the version it replaces is kept as `previous`.
+    """
+
+    def __init__(self, load_fn, lazy=False):
+        self.load_fn = load_fn
+        self.lazy = lazy
+        self.active = None
+        self.previous = None
+        self.last_reload = None
+        self._smoke_X = smoke_inputs()
+        self._lock = threading.Lock()
+        self._loading = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A load running in the parent does not exist in the child
+        self._lock = threading.Lock()
+        self._loading = None
+
+    def validate(self, candidate):
+        """Run the smoke set through `candidate`; raise ModelValidationError if anything is off"""
+        try:
+            predictions, confidence, votes = predict_batch(candidate.model, self._smoke_X, lazy=self.lazy)
+        except Exception as e:
+            raise ModelValidationError(f"Smoke prediction failed: {e}")
+        if predictions.shape != (len(self._smoke_X),) or not np.isin(predictions, (0, 1)).all():
+            raise ModelValidationError("Smoke predictions are not 0/1 labels")
+        if not (np.isfinite(confidence).all() and (confidence >= 0).all() and (confidence <= 100).all()):
+            raise ModelValidationError("Smoke confidences are not within 0-100")
+        candidate.smoke_predictions = predictions
+
+    def activate(self, candidate):
+        """Make a validated version active; the current one becomes `previous`"""
+        with self._lock:
+            if self.active is not None:
+                self.previous = self.active
+            self.active = candidate
+
+    def _reload(self):
+        started = time.perf_counter()
+        result = {'started_at': datetime.now().isoformat(timespec='seconds')}
+        try:
+            candidate = self.load_fn()
+            self.validate(candidate)
+            active = self.active
+            if active is not None and candidate.version == active.version:
+                result['status'] = 'unchanged'
+            else:
+                if active is not None and active.smoke_predictions is not None:
+                    result['smoke_agreement'] = float((candidate.smoke_predictions == active.smoke_predictions).mean())
+                self.activate(candidate)
+                result['status'] = 'activated'
+            result['version'] = candidate.version
+            print(f"✅ Model reload: {result['status']} version {candidate.version}")
+        except Exception as e:
+            result.update(status='failed', error=str(e))
+            print(f"⚠️ Model reload failed, keeping version {self.active.version if self.active else None}: {e}")
+        result['duration_ms'] = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.last_reload = result
+            self._loading = None
+
+    def reload(self, wait=False):
+        """Load the model files again in the background; returns False if a reload is already running.
+
+        With wait=True, blocks until the reload has finished (see last_reload).
+        """
+        with self._lock:
+            if self._loading is not None:
+                loading, started = self._loading, False
+            else:
+                loading = self._loading = threading.Thread(target=self._reload, name='model-reload', daemon=True)
+                started = True
+        if started:
+            loading.start()
+        if wait:
+            loading.join()
+        return started
+
+    def rollback(self):
+        """Swap the active and previous versions; returns the now active version, or None without one"""
+        with self._lock:
+            if self.previous is None:
+                return None
+            self.active, self.previous = self.previous, self.active
+            print(f"✅ Model rolled back to version {self.active.version}")
+            return self.active
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'active': self.active.describe() if self.active else None,
+                'previous': self.previous.describe() if self.previous else None,
+                'reloading': self._loading is not None,
+                'last_reload': self.last_reload,
+            }
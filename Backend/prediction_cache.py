@@ -0,0 +1,74 @@
+"""
+Bounded LRU cache for ensemble predictions
+Keyed on the exact feature tuple (FEATURE_NAMES order) plus the model version
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of (prediction, confidence, votes) results.
+
+    Entries belong to one model version; looking up or storing with a
+    different version drops every entry, so a new model artifact never
+    serves stale results.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max(0, int(max_entries))
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, features: tuple, version):
+        """Cached result for these features, or None"""
+        with self._lock:
+            self._check_version(version)
+            result = self._entries.get(features)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(features)
+            self.hits += 1
+            return result
+
+    def put(self, features: tuple, version, result):
+        if self.max_entries == 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[features] = result
+            self._entries.move_to_end(features)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'model_version': self.version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
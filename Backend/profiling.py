@@ -0,0 +1,258 @@
+"""
+On-demand and sampled per-request profiling
+A profiled request runs its endpoint under cProfile and records a stage
+breakdown (validation, feature extraction, each model's predict, voting and
+database calls). Reports are written as JSON plus a raw .prof file to
+PROFILE_DIR, keeping the newest PROFILE_MAX_FILES.
+
+On demand: send `X-Profile: <PROFILE_TOKEN>` to /predict, /predict/{username}, /batch-predict or /history/{username}; the
+response gets a Server-Timing header and an X-Profile-Id to fetch the report
+from GET /profiles/{id} with the same header. Disabled while PROFILE_TOKEN is
+empty. Sampled: PROFILE_SAMPLE_RATE=N profiles a random 1 in N of those requests.
+The token is only read from the header, so it never ends up in access logs.
+cProfile runs for one request at a time; overlapping profiled requests get
+the stage breakdown only.
+"""
+
+import contextlib
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 100))
+# Functions listed in a report, by cumulative time
+PROFILE_TOP_FUNCTIONS = 40
+
+PROFILED_PATHS = re.compile(r'^/(predict(/[^/]+)?|batch-predict|history/[^/]+)$')
+PROFILE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9]{6}-[0-9a-f]{6}$')
+
+_current = contextvars.ContextVar('request_profile', default=None)
+# cProfile is process-wide from Python 3.12 (sys.monitoring), so only one
+# request may hold it; a second enable() would raise ValueError
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Stage timings and the cProfile run of one request"""
+
+    def __init__(self, method, path, on_demand):
+        # Sortable by time, so rotation can drop the oldest reports by name
+        self.id = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+        self.method = method
+        self.path = path
+        self.on_demand = on_demand
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.profiler = None
+
+    def add(self, stage, seconds):
+        total, calls = self.stages.get(stage, (0.0, 0))
+        self.stages[stage] = (total + seconds, calls + 1)
+
+    def server_timing(self):
+        """Server-Timing header value: one entry per stage plus the total so far, in ms"""
+        entries = [f'{stage};dur={seconds * 1000:.3f}' for stage, (seconds, _) in self.stages.items()]
+        entries.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.3f}')
+        return ', '.join(entries)
+
+    def report(self, status, total_seconds):
+        functions = 'Not run under cProfile: another request was being profiled'
+        if self.profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+            functions = out.getvalue()
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'status': status,
+            'trigger': 'on-demand' if self.on_demand else 'sampled',
+            'total_ms': total_seconds * 1000,
+            'stages': [{'stage': stage, 'ms': seconds * 1000, 'calls': calls}
+                       for stage, (seconds, calls) in self.stages.items()],
+            'functions': functions,
+        }
+
+
+def current():
+    """The profile of the request running in this context, or None"""
+    return _current.get()
+
+
+class _SharedStages:
+    """Adds each stage to several request profiles"""
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+
+    def add(self, stage, seconds):
+        for profile in self.profiles:
+            profile.add(stage, seconds)
+
+
+@contextlib.contextmanager
+def shared_stages(profiles):
+    """Record the stages timed in this block into every profile in `profiles`.
+
+    For work done on another thread for several requests at once, such as a
+    micro-batch: the callers' context is not there, so their profiles are
+    passed in explicitly.
+    """
+    if not profiles:
+        yield
+        return
+    token = _current.set(_SharedStages(profiles))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def record(stage, seconds):
+    """Add `seconds` to a stage of the request being profiled, if any"""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(stage, seconds)
+
+
+class stage:
+    """Context manager timing a block as one stage of the profiled request"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter() if _current.get() is not None else None
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            record(self.name, time.perf_counter() - self.start)
+
+
+def profiled(endpoint):
+    """Wrap a sync endpoint: time validation up to here, then run it under cProfile when profiled.
+
+    cProfile runs here, in the threadpool thread executing the endpoint. If
+    another request holds it, or another profiling tool is active, the
+    request is timed by stage only: profiling never fails the request.
+    """
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        # Body read, JSON parsing and pydantic validation happen before the endpoint runs
+        profile.add('validation', time.perf_counter() - profile.started)
+        if not _profiler_lock.acquire(blocking=False):
+            return endpoint(*args, **kwargs)
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                return endpoint(*args, **kwargs)
+            profile.profiler = profiler
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            _profiler_lock.release()
+    return wrapper
+
+
+def token_matches(token):
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def _requested_token(scope):
+    for name, value in scope.get('headers', []):
+        if name == b'x-profile':
+            return value.decode('latin-1')
+    return None
+
+
+def save_report(profile, report):
+    """Write <id>.json and <id>.prof, then delete the oldest reports beyond PROFILE_MAX_FILES"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f'{profile.id}.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    if profile.profiler is not None:
+        profile.profiler.dump_stats(os.path.join(PROFILE_DIR, f'{profile.id}.prof'))
+
+    reports = sorted(name[:-5] for name in os.listdir(PROFILE_DIR) if name.endswith('.json'))
+    for old_id in reports[:max(0, len(reports) - PROFILE_MAX_FILES)]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, old_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def load_report(profile_id):
+    """The stored report with this id, or None"""
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f'{profile_id}.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that picks the requests to profile and stores their reports"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] not in ('GET', 'POST') or not PROFILED_PATHS.match(scope['path']):
+            await self.app(scope, receive, send)
+            return
+        on_demand = token_matches(_requested_token(scope))
+        sampled = PROFILE_SAMPLE_RATE > 0 and random.randrange(PROFILE_SAMPLE_RATE) == 0
+        if not (on_demand or sampled):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope['method'], scope['path'], on_demand)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if on_demand:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', profile.server_timing().encode()))
+                    headers.append((b'x-profile-id', profile.id.encode()))
+                    message = {**message, 'headers': headers}
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            report = profile.report(status, time.perf_counter() - profile.started)
+            try:
+                await run_in_threadpool(save_report, profile, report)
+            except OSError as e:
+                print(f"⚠️ Could not save profile {profile.id}: {e}")
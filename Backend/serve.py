@@ -0,0 +1,177 @@
+"""
+Pre-fork multi-worker launcher for the prediction API
+The parent process imports main once (models loaded, init_db run), freezes
+the garbage collector and forks the workers, so every worker shares the model
+memory copy-on-write instead of loading its own copy.
+Run from the Backend folder: python serve.py --workers 4 --port 5000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Threads (micro-batcher, history writer) do not survive fork: each worker starts its own
+os.environ['DEFER_BACKGROUND_WORKERS'] = '1'
+# Workers must fork from a parent with the model already loaded, never load it lazily
+os.environ['LAZY_STARTUP'] = '0'
+
+
+def memory_usage(pid):
+    """RSS, PSS and USS (private pages) in kB from /proc/<pid>/smaps_rollup, or None"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            fields = {line.split(':')[0]: int(line.split()[1]) for line in f if line.split()[-1] == 'kB'}
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def print_memory_report(parent_pid, worker_pids):
+    """Per-process RSS and unique memory; USS is what each extra worker really costs"""
+    rows = [('parent', parent_pid)] + [(f'worker {i}', pid) for i, pid in enumerate(worker_pids)]
+    usage = [(name, pid, memory_usage(pid)) for name, pid in rows]
+    if any(mem is None for _, _, mem in usage):
+        print("⚠️ Memory report needs /proc/<pid>/smaps_rollup (Linux)")
+        return
+    print("\n" + "="*60)
+    print(f"{'Process':<10} {'PID':>8} {'RSS (MB)':>10} {'PSS (MB)':>10} {'USS (MB)':>10}")
+    for name, pid, mem in usage:
+        print(f"{name:<10} {pid:>8} {mem['rss'] / 1024:>10.1f} {mem['pss'] / 1024:>10.1f} {mem['uss'] / 1024:>10.1f}")
+    workers = [mem for _, _, mem in usage[1:]]
+    print(f"{'workers':<10} {'':>8} {sum(m['rss'] for m in workers) / 1024:>10.1f} "
+          f"{sum(m['pss'] for m in workers) / 1024:>10.1f} {sum(m['uss'] for m in workers) / 1024:>10.1f}")
+    print(f"Total memory actually used (sum of PSS): {sum(m['pss'] for _, _, m in usage) / 1024:.1f} MB")
+    print("="*60)
+    sys.stdout.flush()
+
+
+def run_worker(app, sock, log_level):
+    """Serve on the inherited listening socket until uvicorn shuts down"""
+    import uvicorn
+    import main
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGUSR1):
+        signal.signal(signum, signal.SIG_DFL)
+    # The parent forwards SIGHUP/SIGUSR2; each worker reloads or rolls back its own registry
+    main.install_signal_handlers()
+    main.start_background_workers()
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, sock, log_level)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        # Never fall back into the parent's supervision loop
+        os._exit(code)
+    return pid
+
+
+def serve(host, port, workers, log_level='info', report_delay=5.0):
+    if not hasattr(os, 'fork'):
+        # No fork on Windows: a single process, as before
+        import uvicorn
+        import main
+        main.start_background_workers()
+        uvicorn.run(main.app, host=host, port=port, log_level=log_level)
+        return
+
+    # Load models and initialize the database exactly once, in the parent
+    import main
+    from database import close_connections
+    close_connections()
+
+    # Move everything loaded so far out of the collector's reach: a GC pass in a
+    # worker would otherwise write to every object header and un-share the pages
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    worker_pids = [spawn(main.app, sock, log_level) for _ in range(workers)]
+    print(f"✅ Serving on {host}:{port} with {workers} pre-forked workers (parent PID {os.getpid()})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    # kill -USR1 <parent PID> prints the memory report again
+    signal.signal(signal.SIGUSR1, lambda signum, frame: print_memory_report(os.getpid(), worker_pids))
+
+    def forward(signum, frame):
+        # The parent swaps too, so replacement workers fork with the current model
+        if signum == signal.SIGHUP:
+            main.model_registry.reload()
+        else:
+            main.model_registry.rollback()
+        for pid in worker_pids:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    # kill -HUP <parent PID> hot-swaps the model files in every worker, kill -USR2 rolls back
+    signal.signal(signal.SIGHUP, forward)
+    signal.signal(signal.SIGUSR2, forward)
+
+    report_at = time.monotonic() + report_delay if report_delay >= 0 else None
+    while worker_pids:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            if report_at is not None and time.monotonic() >= report_at:
+                report_at = None
+                print_memory_report(os.getpid(), worker_pids)
+            time.sleep(0.2)
+            continue
+        if pid not in worker_pids:
+            continue
+        index = worker_pids.index(pid)
+        if stopping:
+            worker_pids.pop(index)
+        else:
+            # A crashed worker is replaced by a fresh fork of the loaded parent
+            print(f"⚠️ Worker {pid} exited (status {status}); starting a replacement")
+            worker_pids[index] = spawn(main.app, sock, log_level)
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker API server")
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--report-delay', type=float, default=5.0,
+                        help="Seconds after startup to print the per-worker memory report (negative disables)")
+    args = parser.parse_args()
+    serve(args.host, args.port, max(1, args.workers), args.log_level, args.report_delay)
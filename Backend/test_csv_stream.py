@@ -0,0 +1,61 @@
+"""
+Tests for the incremental CSV parsing behind /batch-predict/csv
+Run from the Backend folder: python -m pytest test_csv_stream.py
+"""
+
+import asyncio
+import numpy as np
+import pytest
+import csv_stream
+from csv_stream import CSVLineTooLong, iter_row_chunks, parse_rows
+
+HEADER = b'Age,Gender,TB,DB,Alkphos,Sgpt,Sgot,TP,ALB,A/G Ratio,Selector\n'
+ROW = b'65,Female,0.7,0.1,187,16,18,6.8,3.3,0.9,1\n'
+
+
+async def pieces(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def chunks_of(data, piece_size=7, chunk_rows=2):
+    async def collect():
+        return [chunk async for chunk in iter_row_chunks(pieces(data, piece_size), chunk_rows)]
+    return asyncio.run(collect())
+
+
+def test_rows_split_across_reads_are_reassembled():
+    data = '\ufeff'.encode() + HEADER + ROW * 3 + b'\r\n' + ROW.rstrip(b'\n')
+    chunks = chunks_of(data)
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    indices = [index for chunk in chunks for index, _ in chunk]
+    assert indices == [0, 1, 2, 3]
+    assert all(fields == ROW.decode().strip().split(',') for chunk in chunks for _, fields in chunk)
+
+
+def test_first_row_is_data_without_a_header():
+    chunks = chunks_of(ROW * 2, chunk_rows=10)
+    assert [index for index, _ in chunks[0]] == [0, 1]
+
+
+def test_overlong_line_is_rejected(monkeypatch):
+    monkeypatch.setattr(csv_stream, 'CSV_MAX_LINE_BYTES', 100)
+    with pytest.raises(CSVLineTooLong):
+        chunks_of(b'1,' * 200, piece_size=64)
+
+
+def test_parse_rows_reports_bad_rows_and_keeps_the_rest():
+    rows = [
+        (0, ['65', 'Female', '0.7', '0.1', '187', '16', '18', '6.8', '3.3', '0.9']),
+        (1, ['62', 'Male', '', '5.5', '699', '64', '100', '7.5', '3.2', '0.74']),
+        (2, ['62', 'X', '7.3', '4.1', '490', '60', '68', '7', '3.3', '0.89']),
+        (3, ['58', 'M', 'inf', '0.4', '182', '14', '20', '6.8', '3.4', '1']),
+        (4, ['72', 'M', '3.9', '2']),
+        (5, ['46', '1', '1.8', '0.7', '208', '19', '14', '7.6', '4.4', '1.3']),
+    ]
+    X, indices, errors = parse_rows(rows)
+    assert indices == [0, 5]
+    assert np.array_equal(X[:, 1], [0.0, 1.0])
+    assert [index for index, _ in errors] == [1, 2, 3, 4]
+    assert errors[0][1] == errors[2][1] == "Missing, non-numeric or infinite feature value"
+    assert errors[1][1] == "Invalid Gender value: 'X'"
@@ -0,0 +1,113 @@
+"""
+Tests for the history queries in database.py, on a scratch database
+Run from the Backend folder: python -m pytest test_database.py
+"""
+
+import os
+import pytest
+import database
+
+PREDICTION_VALUES = (45.0, 'Male', 1.2, 0.3, 200.0, 30.0, 40.0, 6.5, 3.2, 0.9)
+
+
+@pytest.fixture
+def scratch_db(tmp_path, monkeypatch):
+    """A fresh database with one user, instead of liver_disease.db"""
+    database.close_connections()
+    monkeypatch.setattr(database, 'DB_PATH', os.path.join(tmp_path, 'test.db'))
+    database.init_db()
+    database.add_user('alice', 'password', 'alice@example.com', 'Alice')
+    yield database.get_user('alice')['id']
+    database.close_connections()
+
+
+def add_predictions(user_id, n):
+    for i in range(n):
+        database.add_prediction(user_id, *PREDICTION_VALUES, i % 2, 'Liver Disease Detected', 50.0 + i)
+    return [p['id'] for p in database.get_user_predictions(user_id)]
+
+
+def test_pages_cover_history_newest_first(scratch_db):
+    ids = add_predictions(scratch_db, 7)
+    assert ids == sorted(ids, reverse=True)
+
+    pages, before_id = [], None
+    while True:
+        page = database.get_user_predictions(scratch_db, limit=3, before_id=before_id)
+        if not page:
+            break
+        pages.append([p['id'] for p in page])
+        before_id = page[-1]['id']
+    assert pages == [ids[0:3], ids[3:6], ids[6:7]]
+
+
+def test_cursor_survives_deleting_its_prediction(scratch_db):
+    ids = add_predictions(scratch_db, 6)
+    first_page = database.get_user_predictions(scratch_db, limit=3)
+    cursor = first_page[-1]['id']
+
+    assert database.delete_prediction(cursor, scratch_db)
+    next_page = database.get_user_predictions(scratch_db, limit=3, before_id=cursor)
+    assert [p['id'] for p in next_page] == ids[3:6]
+
+
+def test_pages_are_per_user(scratch_db):
+    database.add_user('bob', 'password', 'bob@example.com', 'Bob')
+    bob = database.get_user('bob')['id']
+    alice_ids = add_predictions(scratch_db, 3)
+    add_predictions(bob, 3)
+    page = database.get_user_predictions(scratch_db, limit=10, before_id=max(alice_ids) + 100)
+    assert [p['id'] for p in page] == alice_ids
+
+
+def recomputed_summary(user_id):
+    """The summary computed from the user's prediction rows, or None without any"""
+    row = database._run(lambda c: c.execute(
+        f'''SELECT {', '.join(database.SUMMARY_AGGREGATES)}, MIN(created_at), MAX(created_at)
+            FROM predictions WHERE user_id = ?''', (user_id,)).fetchone())
+    return dict(zip(database.SUMMARY_COLUMNS, row)) if row[0] else None
+
+
+def assert_summary_current(user_id):
+    summary, expected = database.get_user_summary(user_id), recomputed_summary(user_id)
+    if expected is None:
+        assert summary is None
+        return
+    assert summary.keys() == expected.keys()
+    for column, value in expected.items():
+        assert summary[column] == pytest.approx(value), column
+
+
+def test_summary_follows_inserts_and_deletes(scratch_db):
+    database.add_user('bob', 'password', 'bob@example.com', 'Bob')
+    bob = database.get_user('bob')['id']
+    ids = add_predictions(scratch_db, 5)
+    add_predictions(bob, 2)
+    assert_summary_current(scratch_db)
+    assert_summary_current(bob)
+
+    # Batch inserts (the write-behind path) across two users in one transaction
+    record = dict(zip(('age', 'gender', 'tb', 'db', 'alkphos', 'sgpt', 'sgot', 'tp', 'alb', 'ag_ratio'),
+                      PREDICTION_VALUES), prediction=1, status='Liver Disease Detected', confidence=100.0)
+    assert database.add_predictions([dict(record, user_id=scratch_db), dict(record, user_id=bob, age=70.0)])
+    assert_summary_current(scratch_db)
+    assert_summary_current(bob)
+
+    assert database.delete_prediction(ids[0], scratch_db)
+    assert database.delete_prediction(ids[-1], scratch_db)
+    assert_summary_current(scratch_db)
+    assert database.get_user_summary(scratch_db)['total'] == 4
+
+    # Deleting another user's prediction id changes nothing
+    assert database.delete_prediction(ids[1], bob)
+    assert_summary_current(scratch_db)
+    assert_summary_current(bob)
+
+    for p in database.get_user_predictions(bob):
+        assert database.delete_prediction(p['id'], bob)
+    assert database.get_user_summary(bob) is None
+
+    assert database.clear_user_history(scratch_db)
+    assert database.get_user_summary(scratch_db) is None
+    add_predictions(scratch_db, 1)
+    assert_summary_current(scratch_db)
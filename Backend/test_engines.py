@@ -0,0 +1,108 @@
+"""
+Tests for the NumPy inference engines: predictions must match the sklearn
+estimators in voting_ensemble_model.pkl on every path
+Run from the Backend folder: python -m pytest test_engines.py
+"""
+
+import pickle
+import warnings
+from types import SimpleNamespace
+import numpy as np
+from engines import KNNEngine, RandomForestEngine, SVMEngine
+from ensemble import FusedEnsemble
+from model_artifact import export_artifact, load_artifact
+warnings.filterwarnings('ignore')
+
+
+def load_pipelines():
+    with open('voting_ensemble_model.pkl', 'rb') as f:
+        model_data = pickle.load(f)
+    return model_data['knn_pipeline'], model_data['rf_pipeline'], model_data['svm_pipeline']
+
+
+def scaled_queries(pipeline, n_rows, seed=0):
+    """Scaled training rows with noise, plus some exact training rows (KNN distance ties)"""
+    rng = np.random.default_rng(seed)
+    X_train = pipeline.steps[-1][1]._fit_X
+    rows = X_train[rng.integers(0, len(X_train), n_rows)]
+    noisy = rows + rng.normal(0, 0.25, rows.shape)
+    noisy[::7] = rows[::7]
+    return noisy
+
+
+def test_knn_engine_matches_sklearn():
+    knn_pipeline, _, _ = load_pipelines()
+    knn = knn_pipeline.steps[-1][1]
+    engine = KNNEngine.from_estimator(knn)
+    X = scaled_queries(knn_pipeline, 2000)
+    assert np.array_equal(engine.predict(X), knn.predict(X))
+    assert np.array_equal(engine.predict(X[:1]), knn.predict(X[:1]))
+
+
+def test_rf_engine_matches_sklearn_on_every_path():
+    knn_pipeline, rf_pipeline, _ = load_pipelines()
+    rf = rf_pipeline.steps[-1][1]
+    rf.set_params(n_jobs=1)
+    X = scaled_queries(knn_pipeline, 1500)
+    expected = rf.predict_proba(X)
+
+    engine = RandomForestEngine.from_estimator(rf, n_threads=1)
+    # Tables below the crossover, the reference forest from it on
+    small = engine.reference_min_rows - 1
+    assert np.array_equal(engine.predict_proba(X[:small]), expected[:small])
+    assert np.array_equal(engine.predict_proba(X), expected)
+
+    # Without a reference (as loaded from a model artifact) every size uses the tables
+    engine.reference = None
+    assert np.array_equal(engine.predict_proba(X), expected)
+
+    # Level-wise walk, used for NaN rows or forests over the table budget
+    engine._tables = False
+    assert np.array_equal(engine.predict_proba(X[:200]), expected[:200])
+
+
+def test_rf_engine_normalises_leaf_counts():
+    """scikit-learn < 1.4 stores weighted class counts in tree_.value, not fractions"""
+    knn_pipeline, rf_pipeline, _ = load_pipelines()
+    rf = rf_pipeline.steps[-1][1]
+    estimators = []
+    for estimator in rf.estimators_:
+        tree = estimator.tree_
+        counts = tree.value * tree.weighted_n_node_samples[:, None, None]
+        estimators.append(SimpleNamespace(tree_=SimpleNamespace(
+            node_count=tree.node_count, children_left=tree.children_left, children_right=tree.children_right,
+            feature=tree.feature, threshold=tree.threshold, value=counts, max_depth=tree.max_depth)))
+    old_rf = SimpleNamespace(estimators_=estimators, n_outputs_=1, n_classes_=rf.n_classes_, classes_=rf.classes_)
+
+    engine = RandomForestEngine.from_estimator(old_rf, reference=None)
+    X = scaled_queries(knn_pipeline, 500)
+    assert np.allclose(engine.predict_proba(X), rf.predict_proba(X))
+
+
+def test_svm_engine_matches_sklearn():
+    knn_pipeline, _, svm_pipeline = load_pipelines()
+    svm = svm_pipeline.steps[-1][1]
+    engine = SVMEngine.from_estimator(svm)
+    X = scaled_queries(knn_pipeline, 2000)
+    assert np.array_equal(engine.predict(X), svm.predict(X))
+    assert np.allclose(engine.decision_function(X), svm.decision_function(X))
+
+
+def test_linear_svm_engine_matches_sklearn():
+    from sklearn.svm import SVC
+    knn_pipeline, _, svm_pipeline = load_pipelines()
+    knn = knn_pipeline.steps[-1][1]
+    svm = SVC(kernel='linear', C=1, random_state=42).fit(knn._fit_X, knn._y)
+    engine = SVMEngine.from_estimator(svm)
+    X = scaled_queries(knn_pipeline, 2000)
+    assert np.array_equal(engine.predict(X), svm.predict(X))
+
+
+def test_artifact_round_trip_matches_pipelines(tmp_path):
+    pipelines = load_pipelines()
+    X = scaled_queries(pipelines[0], 1000) * pipelines[0].steps[0][1].scale_ + pipelines[0].steps[0][1].center_
+    export_artifact(FusedEnsemble.from_pipelines(*pipelines, engines=True), str(tmp_path))
+    _, loaded = load_artifact(str(tmp_path))
+    reference = FusedEnsemble.from_pipelines(*pipelines)
+    for ours, theirs in zip(loaded.predict_votes(X), reference.predict_votes(X)):
+        assert np.array_equal(ours, theirs)
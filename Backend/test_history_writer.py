@@ -0,0 +1,109 @@
+"""
+Tests for the write-behind history queue in history_writer.py
+Run from the Backend folder: python -m pytest test_history_writer.py
+"""
+
+import threading
+import time
+from history_writer import HistoryWriter
+
+
+class Store:
+    """write_fn stand-in that records the rows it was given, optionally blocking or failing"""
+
+    def __init__(self, fail_batches=False, fail_records=()):
+        self.rows = []
+        self.fail_batches = fail_batches
+        self.fail_records = set(fail_records)
+        self.release = threading.Event()
+        self.release.set()
+
+    def write(self, records):
+        self.release.wait()
+        if self.fail_batches and len(records) > 1:
+            raise RuntimeError('database is locked')
+        if any(record in self.fail_records for record in records):
+            return False
+        self.rows.extend(records)
+        return True
+
+
+def test_flush_and_close_write_every_queued_record():
+    store = Store()
+    writer = HistoryWriter(store.write, flush_rows=10, flush_interval_ms=200)
+    for i in range(25):
+        writer.add(i)
+    assert writer.flush()
+    assert sorted(store.rows) == list(range(25))
+
+    for i in range(25, 40):
+        writer.add(i)
+    writer.close()
+    assert sorted(store.rows) == list(range(40))
+    assert writer.stats()['rows_written'] == 40
+
+
+def test_flush_does_not_wait_for_later_records():
+    store = Store()
+    writer = HistoryWriter(lambda records: time.sleep(0.01) or store.write(records), flush_rows=5, flush_interval_ms=1)
+    stop = threading.Event()
+
+    def produce():
+        i = 1000
+        while not stop.is_set():
+            writer.add(i)
+            i += 1
+            time.sleep(0.001)
+
+    for i in range(20):
+        writer.add(i)
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        assert writer.flush()
+        assert set(range(20)) <= set(store.rows)
+    finally:
+        stop.set()
+        producer.join()
+        writer.close()
+
+
+def test_flush_times_out_on_a_stuck_writer():
+    store = Store()
+    store.release.clear()
+    writer = HistoryWriter(store.write, flush_rows=1, flush_interval_ms=1, flush_timeout=0.1)
+    writer.add(1)
+    started = time.perf_counter()
+    assert not writer.flush()
+    assert time.perf_counter() - started < 2
+    assert writer.stats()['flush_timeouts'] == 1
+    store.release.set()
+    assert writer.flush()
+    writer.close()
+
+
+def test_failed_batch_falls_back_to_single_records():
+    store = Store(fail_batches=True, fail_records={3})
+    writer = HistoryWriter(store.write, flush_rows=10, flush_interval_ms=50)
+    for i in range(6):
+        writer.add(i)
+    writer.close()
+    stats = writer.stats()
+    assert sorted(store.rows) == [0, 1, 2, 4, 5]
+    assert (stats['rows_written'], stats['failed_rows']) == (5, 1)
+
+
+def test_records_added_while_closing_are_written():
+    store = Store()
+    writer = HistoryWriter(store.write, flush_rows=10, flush_interval_ms=1)
+    adders = [threading.Thread(target=lambda start=start: [writer.add(i) for i in range(start, start + 2000)])
+              for start in range(0, 8000, 2000)]
+    for adder in adders:
+        adder.start()
+    time.sleep(0.002)
+    writer.close()
+    for adder in adders:
+        adder.join()
+    # Records added after close() are written synchronously; none are lost behind the stop sentinel
+    assert sorted(store.rows) == list(range(8000))
+    assert writer.flush()
@@ -5,10 +5,10 @@ Shows examples of majority voting logic
 
 import pickle
 import numpy as np
-import pandas as pd
 from sklearn.model_selection import train_test_split
 import os
 import warnings
+from dataset import load_dataset
 warnings.filterwarnings('ignore')
 
 def test_voting_system():
@@ -32,19 +32,8 @@ def test_voting_system():
         rf_model = ensemble_data['rf_pipeline']
         svm_model = ensemble_data['svm_pipeline']
     
-    # Load the dataset for testing
-    csv_path = 'Indian Liver Patient Dataset (ILPD).csv'
-    df = pd.read_csv(csv_path)
-    
-    # Convert Gender to numeric if it's string
-    if df['Gender'].dtype == 'object':
-        df['Gender'] = (df['Gender'] == 'Male').astype(int)
-    
-    # Handle missing values
-    df = df.dropna()
-    
-    X = df.drop('is_patient', axis=1)
-    y = df['is_patient']
+    # Load the dataset for testing (prepared like the training data, from the cache when it is current)
+    X, y = load_dataset().frame()
     
     # Split data
     _, test_data, _, test_labels = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
@@ -1,6 +1,9 @@
-import pandas as pd
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import RobustScaler
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.ensemble import RandomForestClassifier
@@ -9,263 +12,359 @@ from sklearn.pipeline import Pipeline
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix, classification_report
 import pickle
 import warnings
+from ensemble import FusedEnsemble
+from model_artifact import export_from_pickle
+from dataset import load_dataset
 warnings.filterwarnings('ignore')
 
-# 1. LOAD DATASET
-df = pd.read_csv('Indian Liver Patient Dataset (ILPD).csv')
-
-df.columns = ['Age', 'Gender', 'Total_Bilirubin', 'Direct_Bilirubin', 'Alkaline_Phosphotase', 
-              'Alamine_Aminotransferase', 'Aspartate_Aminotransferase', 'Total_Proteins', 'Albumin', 
-              'Albumin_and_Globulin_Ratio', 'is_patient']
-
-# Convert Gender
-df['Gender'] = df['Gender'].apply(lambda x: 1 if x.upper() in ['M', 'MALE'] else 0)
-
-# Remove NaN
-df = df.dropna()
-
-# Handle outliers
-numeric_cols = ['Age', 'Total_Bilirubin', 'Direct_Bilirubin', 'Alkaline_Phosphotase', 
-                'Alamine_Aminotransferase', 'Aspartate_Aminotransferase', 'Total_Proteins', 
-                'Albumin', 'Albumin_and_Globulin_Ratio']
-
-for col in numeric_cols:
-    Q1 = df[col].quantile(0.25)
-    Q3 = df[col].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    df[col] = df[col].clip(lower_bound, upper_bound)
-
-df['is_patient'] = (df['is_patient'] == 1).astype(int)
-
-X = df[['Age', 'Gender', 'Total_Bilirubin', 'Direct_Bilirubin', 'Alkaline_Phosphotase', 
-        'Alamine_Aminotransferase', 'Aspartate_Aminotransferase', 'Total_Proteins', 'Albumin', 
-        'Albumin_and_Globulin_Ratio']]
-y = df['is_patient']
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
-print("="*100)
-print("TRAINING VOTING ENSEMBLE: KNN + RANDOM FOREST + SVM")
-print("="*100)
-
-# ==================== TRAIN KNN ====================
-print("\n" + "="*100)
-print("1. TRAINING K-NEAREST NEIGHBORS (KNN)")
-print("="*100)
-
-results_knn = {}
-for k in [3, 5, 7, 9, 11]:
-    pipeline = Pipeline([
-        ('scaler', RobustScaler()),
-        ('knn', KNeighborsClassifier(n_neighbors=k))
-    ])
-    
-    pipeline.fit(X_train, y_train)
-    y_pred = pipeline.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    results_knn[k] = accuracy
-    print(f"K={k:2d}: Accuracy = {accuracy*100:.2f}%")
-
-best_k = max(results_knn, key=results_knn.get)
-
-knn_pipeline = Pipeline([
-    ('scaler', RobustScaler()),
-    ('knn', KNeighborsClassifier(n_neighbors=best_k))
-])
-knn_pipeline.fit(X_train, y_train)
-y_pred_knn = knn_pipeline.predict(X_test)
-knn_accuracy = accuracy_score(y_test, y_pred_knn)
-
-print(f"\n✅ Best KNN K={best_k}, Accuracy: {knn_accuracy*100:.2f}%")
-
-# ==================== TRAIN RANDOM FOREST ====================
-print("\n" + "="*100)
-print("2. TRAINING RANDOM FOREST")
-print("="*100)
-
-rf_params = [
+# Candidate hyperparameters for each model, searched in this order (ties go to the earlier one)
+KNN_PARAMS = [{'n_neighbors': k} for k in [3, 5, 7, 9, 11]]
+RF_PARAMS = [
     {'n_estimators': 50, 'max_depth': 10},
     {'n_estimators': 100, 'max_depth': 15},
     {'n_estimators': 200, 'max_depth': 20},
 ]
-
-results_rf = {}
-for i, params in enumerate(rf_params):
-    pipeline = Pipeline([
-        ('scaler', RobustScaler()),
-        ('rf', RandomForestClassifier(random_state=42, n_jobs=-1, **params))
-    ])
-    
-    pipeline.fit(X_train, y_train)
-    y_pred = pipeline.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    results_rf[i] = (accuracy, params)
-    print(f"Config {i+1} (n_estimators={params['n_estimators']}, max_depth={params['max_depth']}): Accuracy = {accuracy*100:.2f}%")
-
-best_rf_idx = max(results_rf, key=lambda x: results_rf[x][0])
-best_rf_params = results_rf[best_rf_idx][1]
-
-rf_pipeline = Pipeline([
-    ('scaler', RobustScaler()),
-    ('rf', RandomForestClassifier(random_state=42, n_jobs=-1, **best_rf_params))
-])
-rf_pipeline.fit(X_train, y_train)
-y_pred_rf = rf_pipeline.predict(X_test)
-rf_accuracy = accuracy_score(y_test, y_pred_rf)
-
-print(f"\n✅ Best Random Forest: n_estimators={best_rf_params['n_estimators']}, max_depth={best_rf_params['max_depth']}, Accuracy: {rf_accuracy*100:.2f}%")
-
-# ==================== TRAIN SVM ====================
-print("\n" + "="*100)
-print("3. TRAINING SUPPORT VECTOR MACHINE (SVM)")
-print("="*100)
-
-svm_params = [
+SVM_PARAMS = [
     {'kernel': 'rbf', 'C': 0.1},
     {'kernel': 'rbf', 'C': 1},
     {'kernel': 'rbf', 'C': 10},
     {'kernel': 'linear', 'C': 1},
 ]
 
-results_svm = {}
-for i, params in enumerate(svm_params):
-    pipeline = Pipeline([
-        ('scaler', RobustScaler()),
-        ('svm', SVC(random_state=42, **params))
-    ])
-    
-    pipeline.fit(X_train, y_train)
-    y_pred = pipeline.predict(X_test)
-    accuracy = accuracy_score(y_test, y_pred)
-    results_svm[i] = (accuracy, params)
-    print(f"Config {i+1} (kernel='{params['kernel']}', C={params['C']}): Accuracy = {accuracy*100:.2f}%")
-
-best_svm_idx = max(results_svm, key=lambda x: results_svm[x][0])
-best_svm_params = results_svm[best_svm_idx][1]
-
-svm_pipeline = Pipeline([
-    ('scaler', RobustScaler()),
-    ('svm', SVC(random_state=42, probability=True, **best_svm_params))
-])
-svm_pipeline.fit(X_train, y_train)
-y_pred_svm = svm_pipeline.predict(X_test)
-svm_accuracy = accuracy_score(y_test, y_pred_svm)
-
-print(f"\n✅ Best SVM: kernel='{best_svm_params['kernel']}', C={best_svm_params['C']}, Accuracy: {svm_accuracy*100:.2f}%")
-
-# ==================== VOTING ENSEMBLE ====================
-print("\n" + "="*100)
-print("4. VOTING ENSEMBLE (MAJORITY VOTING: 2 out of 3)")
-print("="*100)
-
-# Combine predictions using majority voting (2 out of 3 must agree)
-ensemble_predictions = []
-for i in range(len(y_pred_knn)):
-    votes = [y_pred_knn[i], y_pred_rf[i], y_pred_svm[i]]
-    # Majority voting: if at least 2 algorithms predict 1, result is 1, otherwise 0
-    prediction = 1 if sum(votes) >= 2 else 0
-    ensemble_predictions.append(prediction)
-
-ensemble_predictions = np.array(ensemble_predictions)
-ensemble_accuracy = accuracy_score(y_test, ensemble_predictions)
-ensemble_precision = precision_score(y_test, ensemble_predictions)
-ensemble_recall = recall_score(y_test, ensemble_predictions)
-ensemble_f1 = f1_score(y_test, ensemble_predictions)
-
-print(f"\n✅ Ensemble (Voting System) Accuracy: {ensemble_accuracy*100:.2f}%")
-print(f"   Precision: {ensemble_precision*100:.2f}%")
-print(f"   Recall:    {ensemble_recall*100:.2f}%")
-print(f"   F1-Score:  {ensemble_f1:.4f}")
-
-# ==================== COMPARISON ====================
-print("\n" + "="*100)
-print("ALGORITHM COMPARISON")
-print("="*100)
-print(f"KNN (K={best_k})           : {knn_accuracy*100:.2f}%")
-print(f"Random Forest (n={best_rf_params['n_estimators']}): {rf_accuracy*100:.2f}%")
-print(f"SVM ({best_svm_params['kernel']}, C={best_svm_params['C']})        : {svm_accuracy*100:.2f}%")
-print(f"{'─'*50}")
-print(f"Voting Ensemble (2/3)     : {ensemble_accuracy*100:.2f}%")
-
-# ==================== DETAILED METRICS ====================
-print("\n" + "="*100)
-print("DETAILED ENSEMBLE METRICS")
-print("="*100)
-
-cm_ensemble = confusion_matrix(y_test, ensemble_predictions)
-print(f"\nConfusion Matrix:")
-print(cm_ensemble)
-print(f"True Negatives: {cm_ensemble[0, 0]}, False Positives: {cm_ensemble[0, 1]}")
-print(f"False Negatives: {cm_ensemble[1, 0]}, True Positives: {cm_ensemble[1, 1]}")
-
-print(f"\nClassification Report:")
-print(classification_report(y_test, ensemble_predictions, target_names=['Non-Patient', 'Patient']))
-
-# ==================== SAMPLE PREDICTIONS ====================
-print("\n" + "="*100)
-print("SAMPLE PREDICTIONS (First 10 Test Cases)")
-print("="*100)
-print(f"{'Index':<6} {'True':<6} {'KNN':<6} {'RF':<6} {'SVM':<6} {'Ensemble':<10} {'Result'}")
-print(f"{'-'*60}")
-
-for i in range(min(10, len(y_test))):
-    true_label = y_test.iloc[i]
-    knn_pred = y_pred_knn[i]
-    rf_pred = y_pred_rf[i]
-    svm_pred = y_pred_svm[i]
-    ensemble_pred = ensemble_predictions[i]
-    result = "✓ CORRECT" if ensemble_pred == true_label else "✗ WRONG"
-    
-    print(f"{i:<6} {true_label:<6} {knn_pred:<6} {rf_pred:<6} {svm_pred:<6} {ensemble_pred:<10} {result}")
-
-# ==================== SAVE MODELS ====================
-print("\n" + "="*100)
-print("SAVING MODELS")
-print("="*100)
-
-# Save individual models
-model_data = {
-    'knn_pipeline': knn_pipeline,
-    'rf_pipeline': rf_pipeline,
-    'svm_pipeline': svm_pipeline,
-    'knn_accuracy': knn_accuracy,
-    'rf_accuracy': rf_accuracy,
-    'svm_accuracy': svm_accuracy,
-    'ensemble_accuracy': ensemble_accuracy,
-    'ensemble_precision': ensemble_precision,
-    'ensemble_recall': ensemble_recall,
-    'ensemble_f1': ensemble_f1,
-}
-
-with open('voting_ensemble_model.pkl', 'wb') as f:
-    pickle.dump(model_data, f)
-
-print(f"✅ Voting Ensemble Model saved as 'voting_ensemble_model.pkl'")
-
-# Save individual models for reference
-with open('knn_model.pkl', 'wb') as f:
-    pickle.dump(knn_pipeline, f)
-print(f"✅ KNN Model saved as 'knn_model.pkl'")
-
-with open('rf_model.pkl', 'wb') as f:
-    pickle.dump(rf_pipeline, f)
-print(f"✅ Random Forest Model saved as 'rf_model.pkl'")
-
-with open('svm_model.pkl', 'wb') as f:
-    pickle.dump(svm_pipeline, f)
-print(f"✅ SVM Model saved as 'svm_model.pkl'")
-
-# ==================== FINAL SUMMARY ====================
-print("\n" + "="*100)
-print("SUMMARY")
-print("="*100)
-print(f"Voting Ensemble Accuracy: {ensemble_accuracy*100:.2f}%")
-print(f"Precision: {ensemble_precision*100:.2f}%")
-print(f"Recall:    {ensemble_recall*100:.2f}%")
-print(f"F1-Score:  {ensemble_f1:.4f}")
-print(f"\nVoting Strategy: Majority Voting (2 out of 3 algorithms must agree)")
-print(f"  - If ≥2 algorithms predict 'Yes' → Result is 'Yes'")
-print(f"  - If ≤1 algorithms predict 'Yes' → Result is 'No'")
-print("="*100)
+# Process-pool workers for the candidate fits (TRAIN_WORKERS or --workers; 1 fits in this process)
+TRAIN_WORKERS = int(os.environ.get('TRAIN_WORKERS', os.cpu_count() or 1))
+
+
+def make_pipeline(model, params, n_jobs=-1):
+    """Scaler + estimator pipeline for one candidate"""
+    if model == 'knn':
+        estimator = KNeighborsClassifier(**params)
+    elif model == 'rf':
+        estimator = RandomForestClassifier(random_state=42, n_jobs=n_jobs, **params)
+    else:
+        # No probability=True: its internal 5-fold Platt calibration would multiply every fit, and nothing calls predict_proba
+        estimator = SVC(random_state=42, **params)
+    return Pipeline([('scaler', RobustScaler()), (model, estimator)])
+
+
+# Training data of this worker process, set once by init_worker instead of sent with every task
+_data = {}
+
+
+def init_worker(X_train, y_train, X_test, y_test, folds):
+    _data.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, folds=folds)
+
+
+def fit_candidate(model, index, fold, n_jobs):
+    """Fit one candidate on the training set (fold None) or on one cross-validation fold.
+
+    Returns (model, index, fold, pipeline, accuracy, seconds); the pipeline is
+    only sent back for the full fit, which is scored on the test set and kept
+    if it wins. Fold fits are scored on their held-out fold.
+    """
+    start = time.perf_counter()
+    params = {'knn': KNN_PARAMS, 'rf': RF_PARAMS, 'svm': SVM_PARAMS}[model][index]
+    pipeline = make_pipeline(model, params, n_jobs)
+    if fold is None:
+        pipeline.fit(_data['X_train'], _data['y_train'])
+        accuracy = accuracy_score(_data['y_test'], pipeline.predict(_data['X_test']))
+    else:
+        train_idx, valid_idx = _data['folds'][fold]
+        pipeline.fit(_data['X_train'].iloc[train_idx], _data['y_train'].iloc[train_idx])
+        accuracy = accuracy_score(_data['y_train'].iloc[valid_idx], pipeline.predict(_data['X_train'].iloc[valid_idx]))
+        pipeline = None
+    return model, index, fold, pipeline, accuracy, time.perf_counter() - start
+
+
+def search_candidates(X_train, y_train, X_test, y_test, workers, cv_folds):
+    """Fit every candidate of every model (and its folds) across a process pool.
+
+    Returns {model: [candidate dicts in parameter order]} with the fitted
+    pipeline, its test accuracy, the cross-validation scores and the fit time.
+    """
+    folds = list(StratifiedKFold(cv_folds, shuffle=True, random_state=42).split(X_train, y_train)) if cv_folds > 1 else []
+    candidates = {model: [{'params': params, 'pipeline': None, 'accuracy': None, 'cv_scores': [], 'fit_seconds': 0.0}
+                          for params in grid]
+                  for model, grid in (('knn', KNN_PARAMS), ('rf', RF_PARAMS), ('svm', SVM_PARAMS))}
+    # Random Forest uses every core itself only when the fits are not already spread over processes
+    n_jobs = -1 if workers == 1 else 1
+    tasks = [(model, index, fold, n_jobs)
+             for model, grid in candidates.items()
+             for index in range(len(grid))
+             for fold in [None] + list(range(len(folds)))]
+
+    if workers == 1:
+        init_worker(X_train, y_train, X_test, y_test, folds)
+        results = [fit_candidate(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=init_worker,
+                                 initargs=(X_train, y_train, X_test, y_test, folds)) as pool:
+            results = list(pool.map(fit_candidate, *zip(*tasks)))
+
+    for model, index, fold, pipeline, accuracy, seconds in results:
+        candidate = candidates[model][index]
+        candidate['fit_seconds'] += seconds
+        if fold is None:
+            candidate['pipeline'], candidate['accuracy'] = pipeline, accuracy
+        else:
+            candidate['cv_scores'].append(accuracy)
+    if n_jobs == 1:
+        # Serve the winning forest with every core again, as before
+        for candidate in candidates['rf']:
+            candidate['pipeline'].steps[-1][1].set_params(n_jobs=-1)
+    return candidates
+
+
+def pick_best(candidates):
+    """Index of the best candidate: highest mean CV accuracy, or test accuracy without CV"""
+    def score(i):
+        cv_scores = candidates[i]['cv_scores']
+        return np.mean(cv_scores) if cv_scores else candidates[i]['accuracy']
+    return max(range(len(candidates)), key=score)
+
+
+def describe(candidate):
+    text = f"Accuracy = {candidate['accuracy']*100:.2f}%"
+    if candidate['cv_scores']:
+        text += f" (CV {np.mean(candidate['cv_scores'])*100:.2f}% ± {np.std(candidate['cv_scores'])*100:.2f})"
+    return text + f" [{candidate['fit_seconds']:.2f}s fit]"
+
+
+def main(workers=TRAIN_WORKERS, cv_folds=0):
+    stage_seconds = {}
+    stage_started = time.perf_counter()
+
+    # 1. LOAD DATASET: cleaned, Gender-mapped and IQR-clipped by dataset.py, cached until the CSV changes
+    data = load_dataset()
+    X, y = data.frame()
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    stage_seconds['Data loading'] = time.perf_counter() - stage_started
+
+    print("="*100)
+    print("TRAINING VOTING ENSEMBLE: KNN + RANDOM FOREST + SVM")
+    print("="*100)
+    print(f"Candidate search: {workers} worker process(es), "
+          f"{f'{cv_folds}-fold cross-validation' if cv_folds > 1 else 'selection on the test split'}")
+
+    # All candidates of all three models (and their folds) are fitted at once
+    stage_started = time.perf_counter()
+    candidates = search_candidates(X_train, y_train, X_test, y_test, workers, cv_folds)
+    stage_seconds['Candidate search'] = time.perf_counter() - stage_started
+
+    # ==================== TRAIN KNN ====================
+    print("\n" + "="*100)
+    print("1. TRAINING K-NEAREST NEIGHBORS (KNN)")
+    print("="*100)
+
+    for candidate in candidates['knn']:
+        print(f"K={candidate['params']['n_neighbors']:2d}: {describe(candidate)}")
+
+    # The winning candidate is already fitted on X_train: keep it instead of refitting
+    best = candidates['knn'][pick_best(candidates['knn'])]
+    best_k = best['params']['n_neighbors']
+    knn_pipeline = best['pipeline']
+    y_pred_knn = knn_pipeline.predict(X_test)
+    knn_accuracy = best['accuracy']
+
+    print(f"\n✅ Best KNN K={best_k}, Accuracy: {knn_accuracy*100:.2f}%")
+
+    # ==================== TRAIN RANDOM FOREST ====================
+    print("\n" + "="*100)
+    print("2. TRAINING RANDOM FOREST")
+    print("="*100)
+
+    for i, candidate in enumerate(candidates['rf']):
+        params = candidate['params']
+        print(f"Config {i+1} (n_estimators={params['n_estimators']}, max_depth={params['max_depth']}): {describe(candidate)}")
+
+    best = candidates['rf'][pick_best(candidates['rf'])]
+    best_rf_params = best['params']
+    rf_pipeline = best['pipeline']
+    y_pred_rf = rf_pipeline.predict(X_test)
+    rf_accuracy = best['accuracy']
+
+    print(f"\n✅ Best Random Forest: n_estimators={best_rf_params['n_estimators']}, max_depth={best_rf_params['max_depth']}, Accuracy: {rf_accuracy*100:.2f}%")
+
+    # ==================== TRAIN SVM ====================
+    print("\n" + "="*100)
+    print("3. TRAINING SUPPORT VECTOR MACHINE (SVM)")
+    print("="*100)
+
+    for i, candidate in enumerate(candidates['svm']):
+        params = candidate['params']
+        print(f"Config {i+1} (kernel='{params['kernel']}', C={params['C']}): {describe(candidate)}")
+
+    best = candidates['svm'][pick_best(candidates['svm'])]
+    best_svm_params = best['params']
+    svm_pipeline = best['pipeline']
+    y_pred_svm = svm_pipeline.predict(X_test)
+    svm_accuracy = best['accuracy']
+
+    print(f"\n✅ Best SVM: kernel='{best_svm_params['kernel']}', C={best_svm_params['C']}, Accuracy: {svm_accuracy*100:.2f}%")
+
+    stage_started = time.perf_counter()
+
+    # ==================== FUSED ENSEMBLE ====================
+    print("\n" + "="*100)
+    print("FUSING PIPELINES (ONE SHARED SCALER + NUMPY INFERENCE ENGINES)")
+    print("="*100)
+
+    # All three pipelines are fit on X_train, so their scalers must be identical
+    fused_ensemble = FusedEnsemble.from_pipelines(knn_pipeline, rf_pipeline, svm_pipeline, engines=True)
+    fused_knn, fused_rf, fused_svm = fused_ensemble.predict_votes(X_test.values)
+    if not (np.array_equal(fused_knn, y_pred_knn) and np.array_equal(fused_rf, y_pred_rf) and np.array_equal(fused_svm, y_pred_svm)):
+        raise RuntimeError("Fused ensemble predictions differ from the pipeline predictions")
+
+    print("✅ Shared scaler matches all three pipelines; fused engine predictions are identical")
+
+    # Per-model cost (seconds per row) decides the evaluation order for lazy voting
+    model_costs = fused_ensemble.measure_costs(fused_ensemble.transform(X_test.values))
+    for profile in ('row', 'batch'):
+        print(f"{profile.capitalize()} cost order: " + ", ".join(
+            f"{name} {model_costs[profile][name] * 1e6:.1f} µs/row" for name in fused_ensemble.cost_order(1 if profile == 'row' else 2)))
+
+    stage_seconds['Fusing and cost measurement'] = time.perf_counter() - stage_started
+    stage_started = time.perf_counter()
+
+    # ==================== VOTING ENSEMBLE ====================
+    print("\n" + "="*100)
+    print("4. VOTING ENSEMBLE (MAJORITY VOTING: 2 out of 3)")
+    print("="*100)
+
+    # Combine predictions using majority voting (2 out of 3 must agree)
+    ensemble_predictions = []
+    for i in range(len(y_pred_knn)):
+        votes = [y_pred_knn[i], y_pred_rf[i], y_pred_svm[i]]
+        # Majority voting: if at least 2 algorithms predict 1, result is 1, otherwise 0
+        prediction = 1 if sum(votes) >= 2 else 0
+        ensemble_predictions.append(prediction)
+
+    ensemble_predictions = np.array(ensemble_predictions)
+    ensemble_accuracy = accuracy_score(y_test, ensemble_predictions)
+    ensemble_precision = precision_score(y_test, ensemble_predictions)
+    ensemble_recall = recall_score(y_test, ensemble_predictions)
+    ensemble_f1 = f1_score(y_test, ensemble_predictions)
+
+    print(f"\n✅ Ensemble (Voting System) Accuracy: {ensemble_accuracy*100:.2f}%")
+    print(f"   Precision: {ensemble_precision*100:.2f}%")
+    print(f"   Recall:    {ensemble_recall*100:.2f}%")
+    print(f"   F1-Score:  {ensemble_f1:.4f}")
+
+    # ==================== COMPARISON ====================
+    print("\n" + "="*100)
+    print("ALGORITHM COMPARISON")
+    print("="*100)
+    print(f"KNN (K={best_k})           : {knn_accuracy*100:.2f}%")
+    print(f"Random Forest (n={best_rf_params['n_estimators']}): {rf_accuracy*100:.2f}%")
+    print(f"SVM ({best_svm_params['kernel']}, C={best_svm_params['C']})        : {svm_accuracy*100:.2f}%")
+    print(f"{'─'*50}")
+    print(f"Voting Ensemble (2/3)     : {ensemble_accuracy*100:.2f}%")
+
+    # ==================== DETAILED METRICS ====================
+    print("\n" + "="*100)
+    print("DETAILED ENSEMBLE METRICS")
+    print("="*100)
+
+    cm_ensemble = confusion_matrix(y_test, ensemble_predictions)
+    print(f"\nConfusion Matrix:")
+    print(cm_ensemble)
+    print(f"True Negatives: {cm_ensemble[0, 0]}, False Positives: {cm_ensemble[0, 1]}")
+    print(f"False Negatives: {cm_ensemble[1, 0]}, True Positives: {cm_ensemble[1, 1]}")
+
+    print(f"\nClassification Report:")
+    print(classification_report(y_test, ensemble_predictions, target_names=['Non-Patient', 'Patient']))
+
+    # ==================== SAMPLE PREDICTIONS ====================
+    print("\n" + "="*100)
+    print("SAMPLE PREDICTIONS (First 10 Test Cases)")
+    print("="*100)
+    print(f"{'Index':<6} {'True':<6} {'KNN':<6} {'RF':<6} {'SVM':<6} {'Ensemble':<10} {'Result'}")
+    print(f"{'-'*60}")
+
+    for i in range(min(10, len(y_test))):
+        true_label = y_test.iloc[i]
+        knn_pred = y_pred_knn[i]
+        rf_pred = y_pred_rf[i]
+        svm_pred = y_pred_svm[i]
+        ensemble_pred = ensemble_predictions[i]
+        result = "✓ CORRECT" if ensemble_pred == true_label else "✗ WRONG"
+
+        print(f"{i:<6} {true_label:<6} {knn_pred:<6} {rf_pred:<6} {svm_pred:<6} {ensemble_pred:<10} {result}")
+
+    stage_seconds['Evaluation'] = time.perf_counter() - stage_started
+    stage_started = time.perf_counter()
+
+    # ==================== SAVE MODELS ====================
+    print("\n" + "="*100)
+    print("SAVING MODELS")
+    print("="*100)
+
+    # Save individual models (plain sklearn objects, so the pickle loads without this folder on sys.path;
+    # main.py fuses the pipelines again and takes the measured model costs from here)
+    model_data = {
+        'knn_pipeline': knn_pipeline,
+        'rf_pipeline': rf_pipeline,
+        'svm_pipeline': svm_pipeline,
+        'model_costs': model_costs,
+        'knn_accuracy': knn_accuracy,
+        'rf_accuracy': rf_accuracy,
+        'svm_accuracy': svm_accuracy,
+        'ensemble_accuracy': ensemble_accuracy,
+        'ensemble_precision': ensemble_precision,
+        'ensemble_recall': ensemble_recall,
+        'ensemble_f1': ensemble_f1,
+    }
+
+    with open('voting_ensemble_model.pkl', 'wb') as f:
+        pickle.dump(model_data, f)
+
+    print(f"✅ Voting Ensemble Model saved as 'voting_ensemble_model.pkl'")
+
+    # Pickle-free, memory-mappable copy served by main.py; reloaded and checked against the pickle
+    artifact_manifest = export_from_pickle('voting_ensemble_model.pkl', 'model_artifact', X.values)
+    print(f"✅ Model artifact saved as 'model_artifact/' (checksum {artifact_manifest['checksum'][:12]}, "
+          f"predictions identical to the pickle)")
+
+    # Save individual models for reference
+    with open('knn_model.pkl', 'wb') as f:
+        pickle.dump(knn_pipeline, f)
+    print(f"✅ KNN Model saved as 'knn_model.pkl'")
+
+    with open('rf_model.pkl', 'wb') as f:
+        pickle.dump(rf_pipeline, f)
+    print(f"✅ Random Forest Model saved as 'rf_model.pkl'")
+
+    with open('svm_model.pkl', 'wb') as f:
+        pickle.dump(svm_pipeline, f)
+    print(f"✅ SVM Model saved as 'svm_model.pkl'")
+
+    stage_seconds['Saving models and artifact'] = time.perf_counter() - stage_started
+
+    # ==================== FINAL SUMMARY ====================
+    print("\n" + "="*100)
+    print("SUMMARY")
+    print("="*100)
+    print(f"Voting Ensemble Accuracy: {ensemble_accuracy*100:.2f}%")
+    print(f"Precision: {ensemble_precision*100:.2f}%")
+    print(f"Recall:    {ensemble_recall*100:.2f}%")
+    print(f"F1-Score:  {ensemble_f1:.4f}")
+    print(f"\nVoting Strategy: Majority Voting (2 out of 3 algorithms must agree)")
+    print(f"  - If ≥2 algorithms predict 'Yes' → Result is 'Yes'")
+    print(f"  - If ≤1 algorithms predict 'Yes' → Result is 'No'")
+    print(f"\nWall-clock time per stage:")
+    for stage, seconds in stage_seconds.items():
+        print(f"  {stage:<28} {seconds:>8.2f}s")
+    print(f"  {'Total':<28} {sum(stage_seconds.values()):>8.2f}s")
+    print("="*100)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the KNN + Random Forest + SVM voting ensemble")
+    parser.add_argument('--workers', type=int, default=TRAIN_WORKERS,
+                        help="Processes fitting candidates in parallel (1 fits them in this process)")
+    parser.add_argument('--cv-folds', type=int, default=0,
+                        help="Pick each model's candidate by k-fold cross-validation on the training split "
+                             "(0 picks by test accuracy, as before)")
+    args = parser.parse_args()
+    main(max(1, args.workers), args.cv_folds)